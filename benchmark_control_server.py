@@ -0,0 +1,95 @@
+"""Замер задержки и пропускной способности сервера управления.
+
+Поток интерфейса имитируется циклом, который, как MusicPlayer, выполняет
+очередь по запросу GuiDispatcher.wakeup и по резервному таймеру 50 мс.
+
+Запуск: python benchmark_control_server.py [--commands N] [--tcp] [--no-wakeup]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from typing import List
+
+from control_server import ControlClient, ControlServer, add_tracks, move_tracks, remove_tracks
+from gui_dispatcher import GuiDispatcher
+from playlist import PlayList
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    """Перцентиль выборки."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def main() -> None:  # pylint: disable=too-many-locals
+    """Главная функция замера."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=20000, help="количество команд в замере пропускной способности")
+    parser.add_argument("--latency-samples", type=int, default=2000, help="количество последовательных запросов")
+    parser.add_argument("--tcp", action="store_true", help="использовать TCP вместо Unix-сокета")
+    parser.add_argument("--tick", type=float, default=0.05, help="период резервного таймера потока интерфейса, с")
+    parser.add_argument("--no-wakeup", action="store_true", help="выполнять очередь только по таймеру")
+    args = parser.parse_args()
+
+    playlist = PlayList("Benchmark")
+    wakeup = threading.Event()
+    dispatcher = GuiDispatcher(max_batch=100_000, wakeup=None if args.no_wakeup else wakeup.set)
+    stop = threading.Event()
+
+    def gui_loop() -> None:
+        # Аналог сигнала dispatch_requested и QTimer, вызывающих MusicPlayer.apply_background_changes
+        while not stop.is_set():
+            wakeup.wait(args.tick)
+            wakeup.clear()
+            dispatcher.drain()
+
+    handlers = {
+        "status": lambda: {"tracks": len(playlist), "index": playlist.current_index()},
+        "add_tracks": lambda tracks: add_tracks(playlist, tracks),
+        "remove_tracks": lambda indexes: remove_tracks(playlist, indexes),
+        "move_tracks": lambda moves: move_tracks(playlist, moves),
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        unix_path = None if args.tcp else os.path.join(tmp_dir, "control.sock")
+        server = ControlServer(dispatcher, handlers, unix_path=unix_path)
+        gui_thread = threading.Thread(target=gui_loop, daemon=True)
+        gui_thread.start()
+        server.start()
+        client = ControlClient(server.address)
+        try:
+            latencies = []
+            for _ in range(args.latency_samples):
+                started = time.perf_counter()
+                client.call("status")
+                latencies.append((time.perf_counter() - started) * 1000)
+            print(f"Задержка одиночного запроса, мс: p50={statistics.median(latencies):.3f} "
+                  f"p99={_percentile(latencies, 99):.3f} max={max(latencies):.3f}")
+
+            commands = [
+                {"cmd": "add_tracks", "tracks": [{"title": f"Song {i}", "artist": "Artist", "duration": 180}]}
+                for i in range(args.commands)
+            ]
+            started = time.perf_counter()
+            responses = client.call_many(commands)
+            elapsed = time.perf_counter() - started
+            assert all(response["ok"] for response in responses)
+            print(f"Пропускная способность: {args.commands / elapsed:,.0f} команд/с "
+                  f"({args.commands} команд за {elapsed:.3f} с, треков в плейлисте: {len(playlist)})")
+
+            started = time.perf_counter()
+            client.call("remove_tracks", indexes=list(range(0, len(playlist), 2)))
+            print(f"Пакетное удаление половины плейлиста одним запросом: "
+                  f"{(time.perf_counter() - started) * 1000:.1f} мс")
+        finally:
+            client.close()
+            server.close()
+            stop.set()
+            wakeup.set()
+            gui_thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""Модуль локального сервера управления плейером по протоколу JSON-строк."""
+import asyncio
+import errno
+import json
+import os
+import socket
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from gui_dispatcher import GuiDispatcher
+from composition import Composition
+from playlist import PlayList
+from playlist_store import composition_from_dict
+
+DEFAULT_SOCKET_PATH = os.path.join(os.path.expanduser("~"), ".music_player", "control.sock")
+
+# Ограничение длины одной строки запроса
+_LINE_LIMIT = 64 * 1024 * 1024
+
+# (обработчик, аргументы, будущий результат)
+_Command = Tuple[Optional[Callable[..., Any]], Dict[str, Any], 'asyncio.Future']
+
+# Подготовка аргументов команды в потоке сервера
+Preparer = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+def prepare_tracks(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Построить композиции из словарей аргумента tracks.
+
+    Композиция без длительности читает её из файла, поэтому преобразование
+    выполняется в потоке сервера, а не в потоке интерфейса.
+    """
+    arguments["tracks"] = [composition_from_dict(data) for data in arguments.get("tracks", ())]
+    return arguments
+
+
+def add_tracks(playlist: PlayList, tracks: Iterable[Composition]) -> int:
+    """Добавить в конец плейлиста готовые композиции.
+
+    Returns:
+        Количество добавленных треков
+    """
+    compositions = list(tracks)
+    with playlist.batch():
+        for composition in compositions:
+            playlist.append(composition)
+    return len(compositions)
+
+
+def remove_tracks(playlist: PlayList, indexes: Iterable[int]) -> int:
+    """Удалить треки по индексам за один проход.
+
+    Returns:
+        Количество удалённых треков
+    """
+    return len(playlist.remove_many(indexes))
+
+
+def move_tracks(playlist: PlayList, moves: Iterable[Sequence[int]]) -> int:
+    """Последовательно выполнить перемещения [откуда, куда].
+
+    Returns:
+        Количество перемещений
+    """
+    count = 0
+    with playlist.batch():
+        for from_index, to_index in moves:
+            playlist.move(from_index, to_index)
+            count += 1
+    return count
+
+
+class ControlServer:  # pylint: disable=too-many-instance-attributes
+    """Сервер управления на Unix-сокете или локальном TCP-порту.
+
+    Каждая строка запроса — JSON-объект {"id": ..., "cmd": "...", ...аргументы},
+    ответ на неё — {"id": ..., "ok": true, "result": ...} или
+    {"id": ..., "ok": false, "error": "..."}. Ответы на одном соединении
+    приходят в порядке запросов, поэтому клиент может отправлять запросы
+    без ожидания ответов.
+
+    Сервер работает в собственном потоке с циклом asyncio. Команды,
+    пришедшие за одну итерацию цикла, объединяются в пакет и одним вызовом
+    передаются в поток интерфейса через GuiDispatcher. Тяжёлая подготовка
+    аргументов (например, чтение длительности файлов) выполняется заранее
+    в потоке сервера.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+            self, dispatcher: GuiDispatcher, handlers: Dict[str, Callable[..., Any]],
+            unix_path: Optional[str] = DEFAULT_SOCKET_PATH, host: str = "127.0.0.1",
+            port: int = 0, preparers: Optional[Dict[str, Preparer]] = None) -> None:
+        """Инициализация сервера.
+
+        Args:
+            dispatcher: Очередь вызовов потока интерфейса
+            handlers: Обработчики команд по именам, вызываются с аргументами запроса
+            unix_path: Путь к Unix-сокету; None — слушать TCP
+            host: Адрес TCP
+            port: Порт TCP (0 — любой свободный)
+            preparers: Преобразования аргументов команд в потоке сервера;
+                по умолчанию add_tracks получает готовые композиции
+        """
+        self.dispatcher = dispatcher
+        self.handlers = handlers
+        self.preparers = {"add_tracks": prepare_tracks} if preparers is None else preparers
+        self.unix_path = unix_path if hasattr(socket, "AF_UNIX") else None
+        self.host = host
+        self.port = port
+        self.address: Union[str, Tuple[str, int], None] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._batch: List[_Command] = []
+        self._socket_inode: Optional[int] = None
+
+    def start(self) -> None:
+        """Запустить сервер и дождаться готовности к подключениям."""
+        self._thread = threading.Thread(target=self._run, name="control-server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self) -> None:
+        """Цикл событий потока сервера."""
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(self._listen())
+        except OSError as error:
+            self._error = error
+            self._ready.set()
+            self._loop.close()
+            return
+        self._ready.set()
+        self._loop.run_forever()
+        self._server.close()
+        tasks = asyncio.all_tasks(self._loop)
+        for task in tasks:
+            task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    async def _listen(self) -> asyncio.AbstractServer:
+        """Открыть сокет для прослушивания."""
+        if self.unix_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.unix_path)), mode=0o700, exist_ok=True)
+            self._remove_stale_socket()
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            # Файл сокета сразу создаётся с правами 0600, без окна до chmod;
+            # umask общий для процесса, поэтому меняется только на время bind
+            umask = os.umask(0o177)
+            try:
+                listener.bind(self.unix_path)
+            except OSError:
+                listener.close()
+                raise
+            finally:
+                os.umask(umask)
+            server = await asyncio.start_unix_server(self._serve_client, sock=listener, limit=_LINE_LIMIT)
+            self._socket_inode = os.stat(self.unix_path).st_ino
+            self.address = self.unix_path
+        else:
+            server = await asyncio.start_server(self._serve_client, self.host, self.port, limit=_LINE_LIMIT)
+            self.address = server.sockets[0].getsockname()[:2]
+        return server
+
+    def _remove_stale_socket(self) -> None:
+        """Удалить файл сокета, оставшийся от завершившегося экземпляра.
+
+        Raises:
+            OSError: Сокет уже обслуживается другим экземпляром плейера
+        """
+        if not os.path.exists(self.unix_path):
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.unix_path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                pass
+            else:
+                raise OSError(errno.EADDRINUSE, "Control server is already running", self.unix_path)
+        os.remove(self.unix_path)
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Обслужить одно соединение."""
+        responses: 'asyncio.Queue[Optional[Tuple[Any, asyncio.Future]]]' = asyncio.Queue()
+        sender = asyncio.ensure_future(self._send_responses(writer, responses))
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    responses.put_nowait(self._accept(line))
+            responses.put_nowait(None)
+            await sender
+        except asyncio.CancelledError:
+            # Сервер останавливается: неотправленные ответы отбрасываются
+            sender.cancel()
+        finally:
+            writer.close()
+
+    def _accept(self, line: bytes) -> Tuple[Any, 'asyncio.Future']:
+        """Разобрать запрос и поставить команду в пакет."""
+        future = self._loop.create_future()
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+        except ValueError as error:
+            future.set_exception(ValueError(f"Bad request: {error}"))
+            return None, future
+        request_id = request.pop("id", None)
+        cmd = request.pop("cmd", None)
+        handler = self.handlers.get(cmd)
+        if handler is None:
+            future.set_exception(ValueError("Unknown command"))
+            return request_id, future
+        preparer = self.preparers.get(cmd)
+        if preparer is not None:
+            try:
+                request = preparer(request)
+            except (KeyError, TypeError, ValueError) as error:
+                future.set_exception(ValueError(f"Bad request: {error}"))
+                return request_id, future
+        if not self._batch:
+            self._loop.call_soon(self._flush)
+        self._batch.append((handler, request, future))
+        return request_id, future
+
+    def _flush(self) -> None:
+        """Передать накопленный пакет команд в поток интерфейса."""
+        batch, self._batch = self._batch, []
+        self.dispatcher.submit(self._execute, batch)
+
+    def _execute(self, batch: List[_Command]) -> None:
+        """Выполнить пакет команд в потоке интерфейса."""
+        outcomes = []
+        for handler, arguments, future in batch:
+            try:
+                outcomes.append((future, True, handler(**arguments)))
+            except Exception as error:  # pylint: disable=broad-except
+                outcomes.append((future, False, error))
+        self._loop.call_soon_threadsafe(self._resolve, outcomes)
+
+    @staticmethod
+    def _resolve(outcomes: List[Tuple['asyncio.Future', bool, Any]]) -> None:
+        """Передать результаты пакета ожидающим соединениям."""
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    @staticmethod
+    async def _send_responses(writer: asyncio.StreamWriter,
+                              responses: 'asyncio.Queue[Optional[Tuple[Any, asyncio.Future]]]') -> None:
+        """Отправлять ответы в порядке запросов."""
+        while True:
+            item = await responses.get()
+            if item is None:
+                break
+            request_id, future = item
+            try:
+                response = {"id": request_id, "ok": True, "result": await future}
+            except Exception as error:  # pylint: disable=broad-except
+                response = {"id": request_id, "ok": False, "error": str(error) or type(error).__name__}
+            writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            if responses.empty():
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    break
+
+    def close(self) -> None:
+        """Остановить сервер."""
+        if self._loop is not None and self._thread is not None and self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        # Файл удаляется, только если это всё ещё сокет этого сервера
+        try:
+            if self._socket_inode is not None and os.stat(self.unix_path).st_ino == self._socket_inode:
+                os.remove(self.unix_path)
+        except FileNotFoundError:
+            pass
+        self._socket_inode = None
+
+
+class ControlClient:
+    """Синхронный клиент сервера управления для скриптов и горячих клавиш."""
+
+    def __init__(self, address: Union[str, Tuple[str, int]] = DEFAULT_SOCKET_PATH, timeout: float = 10.0) -> None:
+        """Подключение к серверу.
+
+        Args:
+            address: Путь к Unix-сокету или пара (адрес, порт)
+            timeout: Таймаут операций сокета в секундах
+        """
+        if isinstance(address, str):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket.settimeout(timeout)
+        self._socket.connect(address)
+        self._file = self._socket.makefile("rb")
+        self._next_id = 0
+
+    def call_many(self, commands: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Отправить команды одним пакетом и получить ответы в том же порядке."""
+        payload = []
+        for command in commands:
+            self._next_id += 1
+            payload.append(json.dumps(dict(command, id=self._next_id), ensure_ascii=False))
+        if not payload:
+            return []
+        self._socket.sendall(("\n".join(payload) + "\n").encode("utf-8"))
+        return [json.loads(self._file.readline()) for _ in payload]
+
+    def call(self, cmd: str, **arguments) -> Any:
+        """Выполнить одну команду и вернуть её результат.
+
+        Raises:
+            RuntimeError: Сервер вернул ошибку
+        """
+        response = self.call_many([dict(arguments, cmd=cmd)])[0]
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    def close(self) -> None:
+        """Закрыть соединение."""
+        self._file.close()
+        self._socket.close()
@@ -0,0 +1,66 @@
+"""Модуль для передачи изменений из рабочих потоков в поток интерфейса."""
+import traceback
+from collections import deque
+from typing import Any, Callable, Deque, Optional, Tuple
+
+
+class GuiDispatcher:
+    """Очередь вызовов, выполняемых в потоке интерфейса пакетами.
+
+    Рабочие потоки (импорт, предзагрузка, индексация) не изменяют плейлисты
+    напрямую, а ставят вызовы в очередь через submit. Поток интерфейса
+    периодически вызывает drain и выполняет накопившиеся вызовы одним
+    пакетом, после чего обновляет отображение один раз на пакет.
+    Если задан wakeup, он вызывается при появлении вызовов в пустой очереди,
+    чтобы поток интерфейса выполнил drain сразу, не дожидаясь таймера.
+    """
+
+    def __init__(self, max_batch: int = 1000, wakeup: Optional[Callable[[], None]] = None) -> None:
+        """Инициализация очереди.
+
+        Args:
+            max_batch: Максимальное количество вызовов за один drain
+            wakeup: Потокобезопасный запрос вызова drain в потоке интерфейса
+        """
+        self.max_batch = max_batch
+        self.wakeup = wakeup
+        self._calls: Deque[Tuple[Callable[..., Any], tuple]] = deque()
+        self._wakeup_pending = False
+        self.failed = 0
+
+    def submit(self, callback: Callable[..., Any], *args) -> None:
+        """Поставить вызов в очередь; безопасно из любого потока."""
+        self._calls.append((callback, args))
+        self._request_drain()
+
+    def _request_drain(self) -> None:
+        """Разбудить поток интерфейса, если запрос ещё не отправлен."""
+        # Лишний запрос безопасен: drain с пустой очередью ничего не делает
+        if self.wakeup is not None and not self._wakeup_pending:
+            self._wakeup_pending = True
+            self.wakeup()
+
+    def pending(self) -> int:
+        """Количество ожидающих вызовов."""
+        return len(self._calls)
+
+    def drain(self) -> int:
+        """Выполнить накопившиеся вызовы в текущем потоке.
+
+        Returns:
+            Количество выполненных вызовов
+        """
+        self._wakeup_pending = False
+        executed = 0
+        while executed < self.max_batch and self._calls:
+            callback, args = self._calls.popleft()
+            executed += 1
+            try:
+                callback(*args)
+            except Exception:  # pylint: disable=broad-except
+                # Ошибка одного вызова не должна прерывать пакет, но должна быть видна
+                self.failed += 1
+                traceback.print_exc()
+        if self._calls:
+            self._request_drain()
+        return executed
@@ -0,0 +1,417 @@
+"""Модуль для отслеживания изменений в папках музыкальной библиотеки."""
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import select
+import struct
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from playlist import PlayList
+from playlist_store import relocate_tracks
+
+DEFAULT_LIBRARY_PATH = os.path.join(os.path.expanduser("~"), ".music_player", "library.json")
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg")
+
+# Флаги inotify из <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (_IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE
+               | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Размер и время изменения файла
+_Signature = Tuple[int, int]
+
+
+class LibraryChanges(NamedTuple):
+    """Изменения в библиотеке за один цикл проверки."""
+
+    added: List[str]
+    removed: List[str]
+    modified: List[str]
+    moved: List[Tuple[str, str]]
+
+    def is_empty(self) -> bool:
+        """Нет ли изменений."""
+        return not (self.added or self.removed or self.modified or self.moved)
+
+
+class _DirState:  # pylint: disable=too-few-public-methods
+    """Закэшированное состояние одного каталога."""
+
+    __slots__ = ("mtime_ns", "files", "subdirs")
+
+    def __init__(self, mtime_ns: int, files: Dict[str, _Signature], subdirs: Set[str]) -> None:
+        """Инициализация состояния каталога."""
+        self.mtime_ns = mtime_ns
+        self.files = files
+        self.subdirs = subdirs
+
+
+class _Inotify:
+    """Минимальная обёртка над inotify через ctypes."""
+
+    def __init__(self) -> None:
+        """Создать дескриптор inotify; OSError, если механизм недоступен."""
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc not found")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not supported")
+        self.fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths: Dict[int, str] = {}
+        self.watches: Dict[str, int] = {}
+
+    def add_watch(self, path: str) -> None:
+        """Начать отслеживание каталога."""
+        if path in self.watches:
+            return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self.watches[path] = wd
+        self.paths[wd] = path
+
+    def remove_watch(self, path: str) -> None:
+        """Прекратить отслеживание каталога."""
+        wd = self.watches.pop(path, None)
+        if wd is not None:
+            self.paths.pop(wd, None)
+            self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout: float) -> Tuple[Set[str], bool]:
+        """Дождаться событий и прочитать их.
+
+        Returns:
+            (каталоги с изменениями, было ли переполнение очереди событий)
+        """
+        dirty: Set[str] = set()
+        overflow = False
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        while readable:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    overflow = True
+                elif mask & _IN_IGNORED:
+                    path = self.paths.pop(wd, None)
+                    if path is not None and self.watches.get(path) == wd:
+                        del self.watches[path]
+                elif wd in self.paths:
+                    path = self.paths[wd]
+                    # Удаление или перенос самого каталога видны в родителе
+                    dirty.add(os.path.dirname(path) if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF) else path)
+            readable, _, _ = select.select([self.fd], [], [], 0)
+        return dirty, overflow
+
+    def close(self) -> None:
+        """Закрыть дескриптор."""
+        os.close(self.fd)
+
+
+class LibraryWatcher:  # pylint: disable=too-many-instance-attributes
+    """Наблюдатель за папками библиотеки с инкрементальной синхронизацией.
+
+    Для каждого каталога хранится время изменения и список аудиофайлов с их
+    размером и временем изменения. При опросе заново читаются только каталоги,
+    у которых изменилось время изменения; остальные стоят одного stat.
+    На Linux вместо опроса используется inotify: события лишь помечают
+    каталоги для перечитывания. Перезапись файла на месте не меняет время
+    изменения каталога, поэтому опрос сообщает о ней как об изменённом файле
+    только вместе с другими изменениями того же каталога; inotify сообщает
+    о ней сразу по событию закрытия файла.
+    Перемещения распознаются по совпадению размера и времени изменения.
+    Состояние сохраняется на диск, так что изменения, сделанные при закрытом
+    плейере, обнаруживаются первым опросом после запуска.
+    """
+
+    def __init__(self, on_changes: Callable[[LibraryChanges], None],
+                 state_path: str = DEFAULT_LIBRARY_PATH, interval: float = 5.0,
+                 use_inotify: bool = True) -> None:
+        """Инициализация наблюдателя.
+
+        Args:
+            on_changes: Вызывается в потоке наблюдателя при непустых изменениях
+            state_path: Файл с сохранённым состоянием
+            interval: Период опроса в секундах
+            use_inotify: Использовать inotify, если он доступен
+        """
+        self.on_changes = on_changes
+        self.state_path = state_path
+        self.interval = interval
+        self.use_inotify = use_inotify
+        self._roots: List[str] = []
+        self._dirs: Dict[str, _DirState] = {}
+        # _lock защищает состояние каталогов и держится весь проход по дереву,
+        # _roots_lock — только список папок, чтобы add_root не ждал прохода
+        self._lock = threading.Lock()
+        self._roots_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify: Optional[_Inotify] = None
+        self._load_state()
+
+    @property
+    def roots(self) -> List[str]:
+        """Отслеживаемые папки."""
+        with self._roots_lock:
+            return list(self._roots)
+
+    def _load_state(self) -> None:
+        """Загрузить сохранённое состояние."""
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, encoding="utf-8") as file:
+            state = json.load(file)
+        self._roots = state["roots"]
+        for path, (mtime_ns, files, subdirs) in state["dirs"].items():
+            self._dirs[path] = _DirState(
+                mtime_ns, {name: tuple(signature) for name, signature in files.items()}, set(subdirs)
+            )
+
+    def save_state(self) -> None:
+        """Сохранить состояние на диск."""
+        with self._lock:
+            state = {
+                "roots": self.roots,
+                "dirs": {path: [dir_state.mtime_ns, dir_state.files, sorted(dir_state.subdirs)]
+                         for path, dir_state in self._dirs.items()},
+            }
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.state_path)
+
+    def add_root(self, path: str) -> None:
+        """Начать отслеживание папки; её файлы попадут в ближайшие изменения."""
+        path = os.path.abspath(path)
+        with self._roots_lock:
+            if path not in self._roots:
+                self._roots.append(path)
+
+    def remove_root(self, path: str) -> None:
+        """Прекратить отслеживание папки, не сообщая об удалении её файлов."""
+        path = os.path.abspath(path)
+        with self._lock, self._roots_lock:
+            if path in self._roots:
+                self._roots.remove(path)
+                prefix = path + os.sep
+                for dir_path in [p for p in self._dirs if p == path or p.startswith(prefix)]:
+                    del self._dirs[dir_path]
+                    if self._inotify is not None:
+                        self._inotify.remove_watch(dir_path)
+
+    def scan(self) -> LibraryChanges:
+        """Выполнить один цикл опроса всех папок."""
+        removed: Dict[str, _Signature] = {}
+        added: Dict[str, _Signature] = {}
+        modified: List[str] = []
+        with self._lock:
+            for root in self.roots:
+                # Недоступная папка (например, отключённый диск) не считается удалённой
+                if os.path.isdir(root):
+                    self._poll_tree(root, added, removed, modified)
+        return self._finish_cycle(added, removed, modified)
+
+    def _rescan_dirs(self, paths: Iterable[str]) -> LibraryChanges:
+        """Перечитать отдельные каталоги по событиям inotify."""
+        removed: Dict[str, _Signature] = {}
+        added: Dict[str, _Signature] = {}
+        modified: List[str] = []
+        roots = self.roots
+        with self._lock:
+            for path in sorted(paths):
+                if path in self._dirs or path in roots:
+                    self._rescan_dir(path, added, removed, modified)
+        return self._finish_cycle(added, removed, modified)
+
+    def _poll_tree(self, root: str, added: Dict[str, _Signature], removed: Dict[str, _Signature],
+                   modified: List[str]) -> None:
+        """Обойти дерево, перечитывая только изменившиеся каталоги."""
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            dir_state = self._dirs.get(path)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                self._drop_dir(path, removed)
+                continue
+            if dir_state is None or dir_state.mtime_ns != mtime_ns:
+                self._rescan_dir(path, added, removed, modified, scan_new_subdirs=False)
+                dir_state = self._dirs.get(path)
+            if dir_state is not None:
+                stack.extend(os.path.join(path, name) for name in dir_state.subdirs)
+
+    def _rescan_dir(self, path: str, added: Dict[str, _Signature], removed: Dict[str, _Signature],
+                    modified: List[str], scan_new_subdirs: bool = True) -> None:
+        """Перечитать содержимое одного каталога и сравнить с кэшем."""
+        # pylint: disable=too-many-locals,too-many-branches
+        old_state = self._dirs.get(path, _DirState(0, {}, set()))
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            if self._inotify is not None:
+                # Подписка до чтения, чтобы не пропустить файлы, созданные во время чтения
+                self._watch(path)
+            entries = list(os.scandir(path))
+        except OSError:
+            self._drop_dir(path, removed)
+            return
+        files: Dict[str, _Signature] = {}
+        subdirs: Set[str] = set()
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.add(entry.name)
+                elif entry.name.lower().endswith(AUDIO_EXTENSIONS) and entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                # Файл исчез во время чтения каталога
+                continue
+
+        for name, signature in files.items():
+            old_signature = old_state.files.get(name)
+            if old_signature is None:
+                added[os.path.join(path, name)] = signature
+            elif old_signature != signature:
+                modified.append(os.path.join(path, name))
+        for name in old_state.files.keys() - files.keys():
+            removed[os.path.join(path, name)] = old_state.files[name]
+        for name in old_state.subdirs - subdirs:
+            self._drop_dir(os.path.join(path, name), removed)
+
+        self._dirs[path] = _DirState(mtime_ns, files, subdirs)
+        if scan_new_subdirs:
+            for name in subdirs - old_state.subdirs:
+                self._poll_tree(os.path.join(path, name), added, removed, modified)
+
+    def _drop_dir(self, path: str, removed: Dict[str, _Signature]) -> None:
+        """Забыть исчезнувший каталог вместе с вложенными."""
+        stack = [path]
+        while stack:
+            dir_path = stack.pop()
+            dir_state = self._dirs.pop(dir_path, None)
+            if dir_state is None:
+                continue
+            if self._inotify is not None:
+                self._inotify.remove_watch(dir_path)
+            for name, signature in dir_state.files.items():
+                removed[os.path.join(dir_path, name)] = signature
+            stack.extend(os.path.join(dir_path, name) for name in dir_state.subdirs)
+
+    @staticmethod
+    def _finish_cycle(added: Dict[str, _Signature], removed: Dict[str, _Signature],
+                      modified: List[str]) -> LibraryChanges:
+        """Распознать перемещения среди удалённых и добавленных файлов."""
+        by_signature: Dict[_Signature, List[str]] = {}
+        for path, signature in added.items():
+            by_signature.setdefault(signature, []).append(path)
+        moved = []
+        for old_path, signature in list(removed.items()):
+            candidates = by_signature.get(signature)
+            if candidates and len(candidates) == 1:
+                new_path = candidates.pop()
+                moved.append((old_path, new_path))
+                del removed[old_path]
+                del added[new_path]
+        return LibraryChanges(sorted(added), sorted(removed), sorted(modified), moved)
+
+    def _watch(self, path: str) -> None:
+        """Подписаться на события каталога, при нехватке наблюдений перейти на опрос."""
+        try:
+            self._inotify.add_watch(path)
+        except OSError as error:
+            if error.errno in (errno.ENOSPC, errno.ENOMEM):
+                self._inotify.close()
+                self._inotify = None
+
+    def _run(self) -> None:
+        """Цикл потока наблюдателя."""
+        if self.use_inotify:
+            try:
+                self._inotify = _Inotify()
+            except OSError:
+                self._inotify = None
+            # Подписка до первого опроса: изменения после неё не будут пропущены
+            with self._lock:
+                for path in list(self._dirs):
+                    if self._inotify is not None:
+                        self._watch(path)
+        self._report(self.scan())
+
+        while not self._stop.is_set():
+            inotify = self._inotify
+            if inotify is None:
+                self._stop.wait(self.interval)
+                if not self._stop.is_set():
+                    self._report(self.scan())
+                continue
+            dirty, overflow = inotify.read(0.5)
+            # Короткая пауза объединяет пачку событий в один цикл
+            if dirty and not self._stop.wait(0.2):
+                more, more_overflow = inotify.read(0)
+                dirty |= more
+                overflow = overflow or more_overflow
+            with self._lock:
+                # Новые папки, добавленные после запуска, ещё не отслеживаются
+                dirty |= {root for root in self.roots if root not in self._dirs}
+            if overflow:
+                self._report(self.scan())
+            elif dirty:
+                self._report(self._rescan_dirs(dirty))
+
+    def _report(self, changes: LibraryChanges) -> None:
+        """Передать непустые изменения обработчику."""
+        if not changes.is_empty():
+            self.on_changes(changes)
+
+    def start(self) -> None:
+        """Запустить фоновое отслеживание."""
+        self._thread = threading.Thread(target=self._run, name="library-watcher", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Остановить отслеживание и сохранить состояние."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self.save_state()
+
+
+def apply_to_playlist(playlist: PlayList, changes: LibraryChanges) -> int:
+    """Применить изменения библиотеки к плейлисту.
+
+    Перемещённые треки получают новый путь на прежнем месте, треки
+    удалённых файлов убираются из плейлиста.
+
+    Returns:
+        Количество изменённых треков
+    """
+    return relocate_tracks(playlist, dict(changes.moved), set(changes.removed))
@@ -1,5 +1,7 @@
 """Модуль для работы с кольцевым двусвязным списком."""
-from typing import Any, Optional
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
 
 
 class LinkedListItem:
@@ -21,96 +23,242 @@ class LinkedListItem:
 
 
 class LinkedList:
-    """Кольцевой двусвязный список."""
+    """Кольцевой двусвязный список.
+
+    Все операции выполняются под общей реентерабельной блокировкой lock,
+    поэтому список можно читать и изменять из нескольких потоков.
+    Итерация идёт по неизменяемому снимку текущей эпохи: снимок строится
+    один раз после каждого изменения и используется всеми читателями.
+    """
 
     def __init__(self) -> None:
         """Инициализация списка."""
         self.first_item: Optional[LinkedListItem] = None
         self._tail: Optional[LinkedListItem] = None
         self._size = 0
-        self._current: Optional[LinkedListItem] = None
-        self._iter_count = 0
+        self._observers: List[Callable[..., None]] = []
+        self.lock = threading.RLock()
+        self._epoch = 0
+        self._snapshot: Optional[Tuple[Any, ...]] = ()
+
+    def add_observer(self, observer: Callable[..., None]) -> None:
+        """Подписать обработчик на изменения списка.
+
+        Обработчик вызывается как observer(операция, *аргументы) после каждого
+        изменения: ("append", элемент), ("insert", индекс, элемент),
+        ("remove", индекс, элемент), ("move", откуда, куда),
+        ("replace", индекс, новый элемент, прежний элемент).
+        Изменения, сделанные внутри batch(), обрамляются оповещениями
+        ("begin",) и ("end",). Вызов происходит под блокировкой списка.
+        """
+        with self.lock:
+            self._observers.append(observer)
+
+    def remove_observer(self, observer: Callable[..., None]) -> None:
+        """Отписать обработчик изменений."""
+        with self.lock:
+            self._observers.remove(observer)
+
+    def _notify(self, operation: str, *args) -> None:
+        """Оповестить подписчиков об изменении."""
+        for observer in self._observers:
+            observer(operation, *args)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Объединить изменения внутри блока with в одну группу для подписчиков."""
+        with self.lock:
+            self._notify("begin")
+            try:
+                yield
+            finally:
+                self._notify("end")
 
+    @property
+    def epoch(self) -> int:
+        """Номер эпохи, увеличивается при каждом изменении содержимого."""
+        return self._epoch
 
+    def snapshot(self) -> Tuple[Any, ...]:
+        """Неизменяемый снимок содержимого текущей эпохи."""
+        with self.lock:
+            if self._snapshot is None:
+                items = []
+                current = self.first_item
+                for _ in range(self._size):
+                    items.append(current.track)
+                    current = current._next
+                self._snapshot = tuple(items)
+            return self._snapshot
 
     def append_right(self, item) -> None:
         """Добавление элемента в конец списка."""
-        new_item = LinkedListItem(item)
-
-        if self._tail is None:
-            self.first_item = self._tail = new_item
-            new_item._next = new_item._previous = new_item
-        else:
-            new_item._previous = self._tail
-            new_item._next = self.first_item
-            self._tail._next = new_item
-            self.first_item._previous = new_item
-            self._tail = new_item
-        self._size += 1
+        with self.lock:
+            self._insert_at(self._size, LinkedListItem(item))
+            self._notify("append", item)
 
     def append(self, item) -> None:
         """Псевдоним для append_right."""
         self.append_right(item)
 
+    def insert(self, index: int, item) -> None:
+        """Вставка элемента перед позицией index."""
+        with self.lock:
+            if index < 0 or index > self._size:
+                raise IndexError("Index out of range")
+            self._insert_at(index, LinkedListItem(item))
+            self._notify("insert", index, item)
+
     def remove(self, item) -> None:
         """Удаление элемента из списка."""
-        current = self.first_item
-        if current is None:
-            raise ValueError("Item not found")
-
-        for _ in range(self._size):
-            if current.track == item:
-                if self._size == 1:
-                    self.first_item = self._tail = None
-                else:
-                    current._previous._next = current._next
-                    current._next._previous = current._previous
-                    if current == self.first_item:
-                        self.first_item = current._next
-                    if current == self._tail:
-                        self._tail = current._previous
-                self._size -= 1
+        with self.lock:
+            current = self.first_item
+            for index in range(self._size):
+                if current.track == item:
+                    self._unlink(current)
+                    self._notify("remove", index, current.track)
+                    return
+                current = current._next
+        raise ValueError("Item not found")
+
+    def remove_at(self, index: int) -> Any:
+        """Удаление элемента по индексу."""
+        with self.lock:
+            node = self._node_at(index)
+            self._unlink(node)
+            self._notify("remove", index, node.track)
+            return node.track
+
+    def remove_many(self, indexes: Iterable[int]) -> List[Any]:
+        """Удаление элементов по набору индексов за один проход с конца списка.
+
+        Returns:
+            Удалённые элементы в порядке убывания индексов
+        """
+        with self.batch():
+            ordered = sorted(set(indexes), reverse=True)
+            if ordered and (ordered[-1] < 0 or ordered[0] >= self._size):
+                raise IndexError("Index out of range")
+            removed = []
+            node, position = self._tail, self._size - 1
+            for index in ordered:
+                for _ in range(position - index):
+                    node = node._previous
+                previous = node._previous
+                self._unlink(node)
+                self._notify("remove", index, node.track)
+                removed.append(node.track)
+                node, position = previous, index - 1
+            return removed
+
+    def move(self, from_index: int, to_index: int) -> None:
+        """Перемещение элемента с позиции from_index на позицию to_index."""
+        with self.lock:
+            node = self._node_at(from_index)
+            if not 0 <= to_index < self._size:
+                raise IndexError("Index out of range")
+            if from_index == to_index:
                 return
+            self._detach(node)
+            self._insert_at(to_index, node)
+            self._notify("move", from_index, to_index)
+
+    def replace(self, index: int, item) -> Any:
+        """Замена элемента на позиции index с сохранением положения узла."""
+        with self.lock:
+            node = self._node_at(index)
+            old_item = node.track
+            node.track = item
+            self._changed()
+            self._notify("replace", index, item, old_item)
+            return old_item
+
+    def replace_each(self, function: Callable[[Any], Any]) -> int:
+        """Замена элементов за один проход по списку.
+
+        Args:
+            function: Возвращает новый элемент вместо переданного или None,
+                если элемент не меняется
+
+        Returns:
+            Количество заменённых элементов
+        """
+        with self.batch():
+            replaced = 0
+            node = self.first_item
+            for index in range(self._size):
+                item = function(node.track)
+                if item is not None:
+                    old_item, node.track = node.track, item
+                    self._changed()
+                    self._notify("replace", index, item, old_item)
+                    replaced += 1
+                node = node._next
+            return replaced
+
+    def _node_at(self, index: int) -> LinkedListItem:
+        """Получение узла по индексу."""
+        if index < 0 or index >= self._size:
+            raise IndexError("Index out of range")
+        current = self.first_item
+        for _ in range(index):
             current = current._next
-        raise ValueError("Item not found")
+        return current
 
+    def _changed(self) -> None:
+        """Начать новую эпоху после изменения содержимого."""
+        self._epoch += 1
+        self._snapshot = None
 
+    def _insert_at(self, index: int, node: LinkedListItem) -> None:
+        """Вставка узла перед позицией index (index == len — в конец)."""
+        if self._tail is None:
+            self.first_item = self._tail = node
+            node._next = node._previous = node
+        else:
+            successor = self.first_item if index == self._size else self._node_at(index)
+            node._previous = successor._previous
+            node._next = successor
+            successor._previous._next = node
+            successor._previous = node
+            if index == 0:
+                self.first_item = node
+            if index == self._size:
+                self._tail = node
+        self._size += 1
+        self._changed()
+
+    def _unlink(self, node: LinkedListItem) -> None:
+        """Удаление узла из списка."""
+        self._detach(node)
+
+    def _detach(self, node: LinkedListItem) -> None:
+        """Исключение узла из кольца."""
+        if self._size == 1:
+            self.first_item = self._tail = None
+        else:
+            node._previous._next = node._next
+            node._next._previous = node._previous
+            if node == self.first_item:
+                self.first_item = node._next
+            if node == self._tail:
+                self._tail = node._previous
+        self._size -= 1
+        self._changed()
 
     def __len__(self) -> int:
         """Возврат количества элементов в списке."""
         return self._size
 
-    def __iter__(self) -> 'LinkedList':
-        """Инициализация итератора для обхода списка."""
-        self._current = self.first_item
-        self._iter_count = 0
-        return self
-
-    def __next__(self) -> Any:
-        """Получение следующего элемента при итерации."""
-        if self._current is None or self._iter_count >= self._size:
-            raise StopIteration
-        data = self._current.track
-        self._current = self._current._next
-        self._iter_count += 1
-        return data
+    def __iter__(self) -> Iterator[Any]:
+        """Итератор по снимку списка, не зависящий от последующих изменений."""
+        return iter(self.snapshot())
 
     def __getitem__(self, index: int) -> Any:
         """Получение элемента по индексу."""
-        if index < 0 or index >= self._size:
-            raise IndexError("Index out of range")
-        current = self.first_item
-        for _ in range(index):
-            current = current._next
-        return current.track
+        with self.lock:
+            return self._node_at(index).track
 
     def __contains__(self, item) -> bool:
         """Проверка наличия элемента в списке."""
-        current = self.first_item
-        for _ in range(self._size):
-            if current.track == item:
-                return True
-            current = current._next
-        return False
-
-
+        return item in self.snapshot()
@@ -0,0 +1,269 @@
+"""Модуль для анализа громкости композиций и нормализации в стиле ReplayGain."""
+import math
+import os
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, NamedTuple, Optional
+# pylint: disable=duplicate-code
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from waveform import BlockReader, open_audio
+
+DEFAULT_METADATA_PATH = os.path.join(os.path.expanduser("~"), ".music_player", "metadata.db")
+
+# Опорный уровень ReplayGain 2.0, LUFS
+TARGET_LOUDNESS = -18.0
+# Длительность блока измерения, как в EBU R128
+_BLOCK_SECONDS = 0.4
+# Количество блоков, читаемых за один шаг: ограничивает память рабочего процесса
+_CHUNK_BLOCKS = 256
+# Абсолютный и относительный пороги стробирования
+_ABSOLUTE_GATE = -70.0
+_RELATIVE_GATE = -10.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS loudness (
+    file_path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    loudness REAL NOT NULL,
+    gain_db REAL NOT NULL,
+    peak REAL NOT NULL
+);
+"""
+
+
+class LoudnessInfo(NamedTuple):
+    """Результат анализа громкости композиции."""
+
+    loudness: float
+    gain_db: float
+    peak: float
+
+
+def _block_loudness(power: Any) -> Any:
+    """Громкость блоков по их средней мощности."""
+    return -0.691 + 10 * np.log10(np.maximum(power, 1e-12))
+
+
+def measure(read_block: BlockReader, frames: int, rate: int) -> LoudnessInfo:
+    """Измерить громкость и пиковый уровень.
+
+    Громкость вычисляется по среднеквадратичному уровню блоков по 400 мс
+    со стробированием, как в EBU R128, но без K-фильтра.
+    """
+    block_frames = max(1, min(frames, int(rate * _BLOCK_SECONDS)))
+    chunk_frames = block_frames * _CHUNK_BLOCKS
+    powers = []
+    peak = 0.0
+    for start in range(0, frames, chunk_frames):
+        data = read_block(start, min(frames, start + chunk_frames))
+        if data.size == 0:
+            continue
+        peak = max(peak, float(np.abs(data).max()))
+        whole = data.shape[0] // block_frames * block_frames
+        if whole:
+            blocks = data[:whole].reshape(-1, block_frames * data.shape[1]).astype(np.float64)
+            powers.append(np.mean(blocks * blocks, axis=1))
+    power = np.concatenate(powers) if powers else np.zeros(0)
+
+    power = power[_block_loudness(power) > _ABSOLUTE_GATE]
+    if power.size == 0:
+        # Тишина: усиление не применяется
+        return LoudnessInfo(_ABSOLUTE_GATE, 0.0, peak)
+    relative_gate = float(_block_loudness(power.mean())) + _RELATIVE_GATE
+    power = power[_block_loudness(power) > relative_gate]
+    loudness = float(_block_loudness(power.mean()))
+
+    gain_db = TARGET_LOUDNESS - loudness
+    if peak > 0:
+        # Усиление не должно приводить к перегрузке
+        gain_db = min(gain_db, -20 * math.log10(peak))
+    return LoudnessInfo(loudness, gain_db, peak)
+
+
+def analyze_file(path: str) -> LoudnessInfo:
+    """Проанализировать аудиофайл; выполняется в рабочем процессе."""
+    read_block, frames, _, rate = open_audio(path)
+    return measure(read_block, frames, rate)
+
+
+def volume_for(gain_db: float) -> float:
+    """Громкость для pygame.mixer.music.set_volume по усилению в дБ.
+
+    Микшер может только ослаблять сигнал, поэтому громкость не превышает 1.0.
+    """
+    return max(0.0, min(1.0, 10 ** (gain_db / 20)))
+
+
+class LoudnessAnalyzer:  # pylint: disable=too-many-instance-attributes
+    """Пакетный анализатор громкости с кэшем результатов в SQLite.
+
+    Анализ выполняется в пуле процессов, каждый из которых перезапускается
+    после max_tasks_per_child файлов. WAV читается блоками через memmap, и
+    память процесса не зависит от длины трека. Сжатые форматы pygame
+    декодирует целиком, поэтому пиковая память — по декодированному треку
+    на процесс (около 10 МБ на минуту); для библиотек с длинными миксами
+    стоит уменьшить workers. Результаты хранятся в базе метаданных и привязаны к размеру
+    и времени изменения файла. Пакеты файлов ставятся в очередь и передаются
+    пулу постепенно, не более max_pending одновременно. Без NumPy анализ
+    не выполняется.
+    """
+
+    def __init__(self, path: str = DEFAULT_METADATA_PATH, workers: Optional[int] = None,
+                 max_tasks_per_child: int = 50, max_pending: Optional[int] = None) -> None:
+        """Инициализация анализатора.
+
+        Args:
+            path: Путь к базе метаданных
+            workers: Количество рабочих процессов (по умолчанию — по числу ядер)
+            max_tasks_per_child: Количество файлов, после которого процесс перезапускается
+            max_pending: Предел одновременно переданных пулу файлов пакетного анализа
+                (по умолчанию — четыре на процесс)
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_tasks_per_child = max_tasks_per_child
+        self.max_pending = max_pending or self.workers * 4
+        self._lock = threading.RLock()
+        self._pending: Dict[str, Future] = {}
+        self._queue: Deque[str] = deque()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._closed = False
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, path: str) -> Optional[LoudnessInfo]:
+        """Получить результат анализа из кэша, если файл не изменился."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT loudness, gain_db, peak FROM loudness WHERE file_path = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        return LoudnessInfo(*row) if row else None
+
+    def _store(self, path: str, size: int, mtime_ns: int, info: LoudnessInfo) -> None:
+        """Сохранить результат анализа."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO loudness VALUES (?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, info.loudness, info.gain_db, info.peak)
+            )
+
+    def rename(self, old_path: str, new_path: str) -> None:
+        """Перенести результат анализа на новый путь перемещённого файла."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM loudness WHERE file_path = ?", (new_path,))
+            self._conn.execute("UPDATE loudness SET file_path = ? WHERE file_path = ?", (new_path, old_path))
+
+    def forget(self, path: str) -> None:
+        """Удалить результат анализа файла из кэша."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM loudness WHERE file_path = ?", (path,))
+
+    def request(self, path: str,
+                callback: Optional[Callable[[str, Optional[LoudnessInfo]], None]] = None) -> Optional[Future]:
+        """Проанализировать файл в фоне, если результата нет в кэше.
+
+        Args:
+            path: Путь к аудиофайлу
+            callback: Вызывается в служебном потоке как callback(путь, результат или None)
+        """
+        if not NUMPY_AVAILABLE or self._closed:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        # Проверка кэша до захвата общей блокировки: get() из потока интерфейса не ждёт
+        if path not in self._pending and self.get(path) is not None:
+            return None
+        with self._lock:
+            if self._closed:
+                return None
+            future = self._pending.get(path)
+            if future is None:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, max_tasks_per_child=self.max_tasks_per_child
+                    )
+                future = self._pool.submit(analyze_file, path)
+                self._pending[path] = future
+                future.add_done_callback(lambda done: self._finish(path, stat.st_size, stat.st_mtime_ns, done))
+        if callback is not None:
+            future.add_done_callback(lambda done: callback(path, self._result(done)))
+        return future
+
+    @staticmethod
+    def _result(future: Future) -> Optional[LoudnessInfo]:
+        """Результат завершённого анализа или None при ошибке."""
+        if future.cancelled() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def _finish(self, path: str, size: int, mtime_ns: int, future: Future) -> None:
+        """Сохранить результат завершённого анализа."""
+        with self._lock:
+            self._pending.pop(path, None)
+            info = self._result(future)
+            if info is not None and not self._closed:
+                self._store(path, size, mtime_ns, info)
+        self._fill()
+
+    def analyze_batch(self, paths: Iterable[str]) -> int:
+        """Поставить в очередь анализ набора файлов, например всего плейлиста.
+
+        Вызов не ждёт анализа; проверка кэша и передача файлов пулу выполняются
+        по мере освобождения места, в том числе из служебного потока пула.
+
+        Returns:
+            Количество поставленных в очередь файлов
+        """
+        with self._lock:
+            if self._closed or not NUMPY_AVAILABLE:
+                return 0
+            count = len(self._queue)
+            self._queue.extend(path for path in paths if path)
+            count = len(self._queue) - count
+        self._fill()
+        return count
+
+    def _fill(self) -> None:
+        """Передать пулу файлы из очереди в пределах max_pending.
+
+        Блокировка берётся только на выборку из очереди: проверка кэша для
+        каждого файла идёт без неё, чтобы не задерживать get() на долгом
+        проходе по очереди уже проанализированных файлов.
+        """
+        while True:
+            with self._lock:
+                if not self._queue or len(self._pending) >= self.max_pending or self._closed:
+                    return
+                path = self._queue.popleft()
+            self.request(path)
+
+    def pending(self) -> int:
+        """Количество файлов в очереди и в работе."""
+        with self._lock:
+            return len(self._queue) + len(self._pending)
+
+    def close(self) -> None:
+        """Остановить анализ и закрыть базу."""
+        with self._lock:
+            self._closed = True
+            self._queue.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._conn.close()
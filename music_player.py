@@ -1,7 +1,7 @@
 """Модуль музыкального плейера с графическим интерфейсом."""
 import sys
 import os
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Set
 try:
     from PyQt5.QtWidgets import (
         QApplication, QMainWindow, QVBoxLayout, QHBoxLayout,
@@ -9,36 +9,115 @@ try:
         QMessageBox, QLabel, QComboBox, QFileDialog,
         QGroupBox, QProgressBar, QTextEdit, QSplitter
     )
-    from PyQt5.QtCore import Qt, QTimer
-    from PyQt5.QtGui import QFont
+    from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+    from PyQt5.QtGui import QFont, QPainter, QColor
 except ImportError:
     # Заглушки для pylint
     QApplication = QMainWindow = QVBoxLayout = QHBoxLayout = None
     QWidget = QPushButton = QListWidget = QInputDialog = None
     QMessageBox = QLabel = QComboBox = QFileDialog = None
     QGroupBox = QProgressBar = QTextEdit = QSplitter = None
-    Qt = QTimer = QFont = None
+    Qt = QTimer = QFont = QPainter = QColor = None
+    pyqtSignal = None
 import pygame
 from composition import Composition
 from playlist import PlayList
+from play_stats import PlayStatsStore
+from playlist_store import LazyPlaylists, PlaylistStore, composition_to_dict
+from playlist_history import PlaylistHistory
+from gui_dispatcher import GuiDispatcher
+from waveform import WaveformCache
+from loudness import LoudnessAnalyzer, volume_for
+from library_watcher import LibraryChanges, LibraryWatcher
+from control_server import ControlServer, add_tracks, move_tracks, remove_tracks
 
 
-class MusicPlayer(QMainWindow):
+class WaveformWidget(QWidget):
+    """Обзор формы волны текущего трека с отметкой позиции."""
+
+    def __init__(self) -> None:
+        """Инициализация виджета."""
+        super().__init__()
+        self.peaks = None
+        self.progress = 0.0
+        self.setMinimumHeight(60)
+
+    def set_peaks(self, peaks) -> None:
+        """Установить пики формы волны (None — нет данных)."""
+        self.peaks = peaks
+        self.update()
+
+    def set_progress(self, progress: float) -> None:
+        """Установить долю воспроизведённой части трека."""
+        self.progress = progress
+        self.update()
+
+    def paintEvent(self, _event) -> None:  # pylint: disable=invalid-name
+        """Отрисовать форму волны."""
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#3c3c3c"))
+        if self.peaks is None or len(self.peaks) == 0:
+            return
+        width = self.width()
+        middle = self.height() / 2
+        played = int(width * self.progress)
+        played_color, rest_color = QColor("#4CAF50"), QColor("#888888")
+        for x in range(width):
+            low, high = self.peaks[x * len(self.peaks) // width]
+            painter.setPen(played_color if x < played else rest_color)
+            painter.drawLine(x, int(middle - high * middle / 127), x, int(middle - low * middle / 127))
+
+
+class MusicPlayer(QMainWindow):  # pylint: disable=too-many-public-methods
     """Музыкальный плейер с графическим интерфейсом."""
 
+    # Запрос выполнения очереди GuiDispatcher из рабочих потоков
+    dispatch_requested = pyqtSignal()
+
     def __init__(self) -> None:
         """Инициализация плейера."""
         super().__init__()
-        self.playlists: Dict[str, PlayList] = {}
+        self._histories: Dict[str, PlaylistHistory] = {}
+        self.playlists = LazyPlaylists(PlaylistStore(), on_evict=self._drop_history)
         self.current_playlist: Optional[PlayList] = None
         pygame.mixer.init()
         self.is_playing = False
         self.is_paused = False
         self.current_position = 0
+        self.play_stats = PlayStatsStore()
+        self._stats_track: Optional[Composition] = None
 
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_progress)
+        self.dispatcher = GuiDispatcher(wakeup=self.dispatch_requested.emit)
+        self.dispatch_requested.connect(self.apply_background_changes, Qt.QueuedConnection)
+        self.waveform_cache = WaveformCache()
+        self.loudness = LoudnessAnalyzer()
+        self.library_watcher = LibraryWatcher(self._on_library_changes)
+        # Резервный опрос очереди на случай, если запрос выполнения потерялся
+        self.dispatch_timer = QTimer()
+        self.dispatch_timer.timeout.connect(self.apply_background_changes)
+        self.dispatch_timer.start(50)
+        self.control_server = ControlServer(self.dispatcher, self._control_handlers())
         self.init_ui()
+        self._load_playlists()
+        self.library_watcher.start()
+        try:
+            self.control_server.start()
+        except OSError:
+            # Плейер работает и без сервера управления, например если запущен второй экземпляр
+            pass
+
+    def _load_playlists(self) -> None:
+        """Показать сохранённые плейлисты по каталогу, не загружая их."""
+        for name in self.playlists:
+            info = self.playlists.info(name)
+            self.playlist_combo.addItem(name)
+            self.playlist_combo.setItemData(
+                self.playlist_combo.count() - 1,
+                f"Треков: {info.track_count}, длительность: {info.total_duration // 60}:{info.total_duration % 60:02d}",
+                Qt.ToolTipRole
+            )
 
     def init_ui(self) -> None:
         """Инициализация пользовательского интерфейса."""
@@ -70,9 +149,13 @@ class MusicPlayer(QMainWindow):
         delete_playlist_btn = QPushButton("❌ Удалить")
         delete_playlist_btn.clicked.connect(self.delete_playlist)
 
+        watch_folder_btn = QPushButton("📁 Папка библиотеки")
+        watch_folder_btn.clicked.connect(self.add_library_folder)
+
         playlist_controls.addWidget(self.playlist_combo)
         playlist_controls.addWidget(create_playlist_btn)
         playlist_controls.addWidget(delete_playlist_btn)
+        playlist_controls.addWidget(watch_folder_btn)
         playlist_layout.addLayout(playlist_controls)
 
         # Группа треков
@@ -81,7 +164,7 @@ class MusicPlayer(QMainWindow):
 
         self.track_list = QListWidget()
         self.track_list.setDragDropMode(QListWidget.InternalMove)
-        self.track_list.itemChanged.connect(self.reorder_tracks)
+        self.track_list.model().rowsMoved.connect(self.reorder_tracks)
 
         track_controls = QHBoxLayout()
         add_track_btn = QPushButton("🎵 Добавить")
@@ -90,8 +173,18 @@ class MusicPlayer(QMainWindow):
         remove_track_btn = QPushButton("🗑️ Удалить")
         remove_track_btn.clicked.connect(self.remove_track)
 
+        undo_btn = QPushButton("↩️ Отменить")
+        undo_btn.setShortcut("Ctrl+Z")
+        undo_btn.clicked.connect(self.undo_edit)
+
+        redo_btn = QPushButton("↪️ Повторить")
+        redo_btn.setShortcut("Ctrl+Shift+Z")
+        redo_btn.clicked.connect(self.redo_edit)
+
         track_controls.addWidget(add_track_btn)
         track_controls.addWidget(remove_track_btn)
+        track_controls.addWidget(undo_btn)
+        track_controls.addWidget(redo_btn)
 
         tracks_layout.addWidget(self.track_list)
         tracks_layout.addLayout(track_controls)
@@ -139,6 +232,7 @@ class MusicPlayer(QMainWindow):
             }
         """)
         self.duration_label = QLabel("00:00")
+        self.waveform = WaveformWidget()
 
         progress_layout.addWidget(self.time_label)
         progress_layout.addWidget(self.progress_bar)
@@ -165,6 +259,7 @@ class MusicPlayer(QMainWindow):
         control_layout.addWidget(next_btn)
 
         player_layout.addWidget(self.current_track_label)
+        player_layout.addWidget(self.waveform)
         player_layout.addLayout(progress_layout)
         player_layout.addLayout(control_layout)
 
@@ -231,14 +326,19 @@ class MusicPlayer(QMainWindow):
         name, ok = QInputDialog.getText(self, "Создать плейлист", "Название плейлиста:")
         if ok and name:
             if name not in self.playlists:
-                self.playlists[name] = PlayList(name)
-                self.playlist_combo.addItem(name)
-                self.playlist_combo.setCurrentText(name)
-                self.current_playlist = self.playlists[name]
-                self.update_track_list()
+                self._create_playlist(name)
             else:
                 QMessageBox.warning(self, "Ошибка", "Плейлист с таким названием уже существует")
 
+    def _create_playlist(self, name: str) -> None:
+        """Создать плейлист и сделать его текущим."""
+        self.playlists.create(name)
+        self.playlists.active = name
+        self.playlist_combo.addItem(name)
+        self.playlist_combo.setCurrentText(name)
+        self.current_playlist = self.playlists[name]
+        self.update_track_list()
+
     def delete_playlist(self) -> None:
         """Удалить текущий плейлист."""
         current_name = self.playlist_combo.currentText()
@@ -248,21 +348,99 @@ class MusicPlayer(QMainWindow):
                 f"Удалить плейлист '{current_name}'?"
             )
             if reply == QMessageBox.Yes:
-                del self.playlists[current_name]
-                current_index = self.playlist_combo.currentIndex()
-                self.playlist_combo.removeItem(current_index)
-                self.current_playlist = None
-                self.update_track_list()
+                self._delete_playlist(current_name)
+
+    def _delete_playlist(self, name: str) -> None:
+        """Удалить плейлист и убрать его из списка выбора."""
+        is_current = name == self.playlist_combo.currentText()
+        del self.playlists[name]
+        self._drop_history(name)
+        self.playlist_combo.removeItem(self.playlist_combo.findText(name))
+        if is_current:
+            self.current_playlist = None
+            self.update_track_list()
 
     def select_playlist(self, name: str) -> None:
         """Выбрать плейлист."""
         if name in self.playlists:
+            self.playlists.active = name
             self.current_playlist = self.playlists[name]
+            self._current_history()
             self.update_track_list()
         else:
+            self.playlists.active = None
             self.current_playlist = None
             self.track_list.clear()
 
+    def apply_background_changes(self) -> None:
+        """Выполнить изменения, поставленные в очередь рабочими потоками."""
+        # Список треков перерисовывается, только если пакет изменил плейлист
+        playlist = self.current_playlist
+        epoch = playlist.epoch if playlist else None
+        if not self.dispatcher.drain():
+            return
+        if self.current_playlist is not playlist or (playlist and playlist.epoch != epoch):
+            self.update_track_list()
+
+    def _drop_history(self, name: str, _playlist: Optional[PlayList] = None) -> None:
+        """Освободить историю правок выгруженного или удалённого плейлиста."""
+        history = self._histories.pop(name, None)
+        if history is not None:
+            history.close()
+
+    def _current_history(self) -> Optional[PlaylistHistory]:
+        """Получить историю правок текущего плейлиста."""
+        if self.current_playlist is None:
+            return None
+        name = self.current_playlist.name
+        history = self._histories.get(name)
+        # После выгрузки и повторной загрузки плейлист — новый объект
+        if history is None or history.linked_list is not self.current_playlist:
+            if history is not None:
+                history.close()
+            history = PlaylistHistory(self.current_playlist)
+            self._histories[name] = history
+        return history
+
+    def undo_edit(self) -> None:
+        """Отменить последнюю правку текущего плейлиста."""
+        history = self._current_history()
+        if history and history.undo():
+            self.update_track_list()
+
+    def redo_edit(self) -> None:
+        """Повторить отменённую правку текущего плейлиста."""
+        history = self._current_history()
+        if history and history.redo():
+            self.update_track_list()
+
+    def add_library_folder(self) -> None:
+        """Добавить папку библиотеки для отслеживания изменений."""
+        folder = QFileDialog.getExistingDirectory(self, "Выберите папку библиотеки")
+        if folder:
+            self.library_watcher.add_root(folder)
+
+    def _on_library_changes(self, changes: LibraryChanges) -> None:
+        """Обработать изменения файлов библиотеки в потоке наблюдателя.
+
+        Кэш громкости обновляется здесь же, а плейлисты — в потоке интерфейса.
+        """
+        for old_path, new_path in changes.moved:
+            self.loudness.rename(old_path, new_path)
+        for path in changes.removed + changes.modified:
+            self.loudness.forget(path)
+        self.loudness.analyze_batch(changes.added + changes.modified)
+        if changes.moved or changes.removed:
+            moved, removed = dict(changes.moved), set(changes.removed)
+            # Журналы незагруженных плейлистов дописываются здесь, загруженные — в потоке интерфейса
+            opened = self.playlists.store.relocate_unloaded(moved, removed)
+            if opened:
+                self.dispatcher.submit(self._apply_library_changes, opened, moved, removed)
+
+    def _apply_library_changes(self, names: List[str], moved: Dict[str, str], removed: Set[str]) -> None:
+        """Применить перемещения и удаления файлов к загруженным плейлистам."""
+        self.playlists.relocate(names, moved, removed)
+
     def add_track(self) -> None:
         """Добавить трек в текущий плейлист."""
         if self.current_playlist is None:
@@ -285,6 +463,7 @@ class MusicPlayer(QMainWindow):
             if ok:
                 composition = Composition(title, artist, file_path=file_path)
                 self.current_playlist.append(composition)
+                self.loudness.request(file_path)
                 self.update_track_list()
 
     def remove_track(self) -> None:
@@ -294,8 +473,7 @@ class MusicPlayer(QMainWindow):
 
         current_row = self.track_list.currentRow()
         if current_row >= 0:
-            track = self.current_playlist[current_row]
-            self.current_playlist.remove(track)
+            self.current_playlist.remove_at(current_row)
             self.update_track_list()
 
     def update_track_list(self) -> None:
@@ -306,62 +484,59 @@ class MusicPlayer(QMainWindow):
                 self.track_list.addItem(track.get_display_info())
         self.update_stats()
 
-    def reorder_tracks(self) -> None:
-        """Переупорядочить треки в плейлисте."""
+    def reorder_tracks(self, _parent, start: int, _end: int, _destination, row: int) -> None:
+        """Переупорядочить треки в плейлисте после перетаскивания строки."""
         if not self.current_playlist:
             return
 
-        new_order = []
-        for i in range(self.track_list.count()):
-            item_text = self.track_list.item(i).text()
-            for track in self.current_playlist:
-                if str(track) == item_text:
-                    new_order.append(track)
-                    break
-
-        name = self.current_playlist.name
-        self.current_playlist = PlayList(name)
-        for track in new_order:
-            self.current_playlist.append(track)
-        self.playlists[name] = self.current_playlist
+        # row — позиция вставки до удаления строки из исходного места
+        target = row - 1 if row > start else row
+        self.current_playlist.move(start, target)
 
     def play_current(self) -> None:
         """Воспроизвести выбранный трек."""
+        try:
+            self._play_row(self.track_list.currentRow())
+        except ValueError as error:
+            QMessageBox.warning(self, "Ошибка", str(error))
+
+    def _play_row(self, current_row: int) -> None:
+        """Воспроизвести трек строки current_row (отрицательная — первый трек).
+
+        Raises:
+            ValueError: Плейлист пуст или файл не удалось воспроизвести
+        """
         if not self.current_playlist or len(self.current_playlist) == 0:
-            QMessageBox.warning(self, "Ошибка", "Плейлист пуст")
-            return
+            raise ValueError("Плейлист пуст")
 
-        current_row = self.track_list.currentRow()
         if current_row >= 0:
             track = self.current_playlist[current_row]
         else:
             track = self.current_playlist[0]
 
-        # Найти нужный трек и установить как текущий
-        current = self.current_playlist.first_item
-        for _ in range(len(self.current_playlist)):
-            if current.track == track:
-                self.current_playlist.current_item = current
-                break
-            current = current.next_item()
+        self.current_playlist.set_current(max(current_row, 0))
         self.current_track_label.setText(f"🎵 {track}")
         self.update_track_info(track)
 
         if track.file_path and os.path.exists(track.file_path):
             try:
                 pygame.mixer.music.load(track.file_path)
+                self._apply_gain(track)
                 pygame.mixer.music.play()
+                self._finish_stats_track(skipped=True)
+                self._start_stats_track(track)
                 self.is_playing = True
                 self.is_paused = False
                 self.play_btn.setText("⏸️ Пауза")
                 self.current_position = 0
                 self.timer.start(1000)
-            except Exception:  # pylint: disable=broad-except
-                QMessageBox.warning(self, "Ошибка", "Не удалось воспроизвести файл")
+            except Exception as error:  # pylint: disable=broad-except
+                raise ValueError("Не удалось воспроизвести файл") from error
 
     def next_track(self) -> None:
         """Перейти к следующему треку."""
         if self.current_playlist and self.current_playlist.current():
+            self._finish_stats_track(skipped=True)
             next_track = self.current_playlist.next_track()
             if next_track:
                 self.current_track_label.setText(f"🎵 {next_track}")
@@ -369,7 +544,9 @@ class MusicPlayer(QMainWindow):
                 if next_track.file_path and os.path.exists(next_track.file_path):
                     try:
                         pygame.mixer.music.load(next_track.file_path)
+                        self._apply_gain(next_track)
                         pygame.mixer.music.play()
+                        self._start_stats_track(next_track)
                         self.current_position = 0
                         if not self.is_playing:
                             self.is_playing = True
@@ -381,6 +558,7 @@ class MusicPlayer(QMainWindow):
     def previous_track(self) -> None:
         """Перейти к предыдущему треку."""
         if self.current_playlist and self.current_playlist.current():
+            self._finish_stats_track(skipped=True)
             prev_track = self.current_playlist.previous_track()
             if prev_track:
                 self.current_track_label.setText(f"🎵 {prev_track}")
@@ -388,7 +566,9 @@ class MusicPlayer(QMainWindow):
                 if prev_track.file_path and os.path.exists(prev_track.file_path):
                     try:
                         pygame.mixer.music.load(prev_track.file_path)
+                        self._apply_gain(prev_track)
                         pygame.mixer.music.play()
+                        self._start_stats_track(prev_track)
                         self.current_position = 0
                         if not self.is_playing:
                             self.is_playing = True
@@ -416,6 +596,12 @@ class MusicPlayer(QMainWindow):
             self.is_playing = True
             self.timer.start(1000)
 
+    def seek(self, position: int) -> None:
+        """Перейти к позиции текущего трека в секундах."""
+        self.current_position = max(0, int(position))
+        if self.is_playing:
+            pygame.mixer.music.play(start=self.current_position)
+
     def update_track_info(self, track: 'Composition') -> None:
         """Обновить информацию о треке."""
         file_name = (
@@ -434,6 +620,28 @@ class MusicPlayer(QMainWindow):
             f"📍 Путь: {path_info}"
         )
         self.track_info.setText(info_text)
+        self._show_waveform(track)
+
+    def _show_waveform(self, track: 'Composition') -> None:
+        """Показать форму волны трека, построив её в фоне при отсутствии в кэше."""
+        self.waveform.set_peaks(None)
+        self.waveform.set_progress(0.0)
+        if not track.file_path:
+            return
+        peaks = self.waveform_cache.get(track.file_path)
+        if peaks is not None:
+            self.waveform.set_peaks(peaks)
+        else:
+            self.waveform_cache.request(
+                track.file_path,
+                lambda path, peaks: self.dispatcher.submit(self._on_waveform_ready, path, peaks)
+            )
+
+    def _on_waveform_ready(self, path: str, peaks) -> None:
+        """Показать построенную форму волны, если трек всё ещё текущий."""
+        track = self.current_playlist.current() if self.current_playlist else None
+        if track is not None and track.file_path == path:
+            self.waveform.set_peaks(peaks)
 
     def update_stats(self) -> None:
         """Обновить статистику плейлиста."""
@@ -462,6 +670,7 @@ class MusicPlayer(QMainWindow):
             if current_track.duration > 0:
                 progress = min(100, (self.current_position * 100) // current_track.duration)
                 self.progress_bar.setValue(progress)
+                self.waveform.set_progress(min(1.0, self.current_position / current_track.duration))
 
                 # Обновляем время
                 current_min = self.current_position // 60
@@ -474,14 +683,141 @@ class MusicPlayer(QMainWindow):
 
                 # Автопереключение на следующий трек
                 if self.current_position >= current_track.duration:
+                    self._finish_stats_track(skipped=False)
                     self.next_track()
                     self.current_position = 0
 
+    def _start_stats_track(self, track: Composition) -> None:
+        """Учесть начало воспроизведения трека в статистике."""
+        self.play_stats.record_play(track)
+        self._stats_track = track
+
+    def _finish_stats_track(self, skipped: bool) -> None:
+        """Учесть время прослушивания и пропуск текущего трека."""
+        track = self._stats_track
+        if track is None:
+            return
+        self._stats_track = None
+        self.play_stats.record_listen(track, self.current_position)
+        if skipped and (track.duration <= 0 or self.current_position < track.duration):
+            self.play_stats.record_skip(track)
+
+    def closeEvent(self, event) -> None:  # pylint: disable=invalid-name
+        """Сохранить статистику при закрытии окна."""
+        self._finish_stats_track(skipped=False)
+        self.play_stats.close()
+        self.control_server.close()
+        self.library_watcher.close()
+        # Изменения, переданные наблюдателем перед остановкой, уже учтены в его
+        # сохранённом состоянии и должны попасть в плейлисты до их закрытия
+        while self.dispatcher.drain():
+            pass
+        self.playlists.close()
+        self.waveform_cache.close()
+        self.loudness.close()
+        super().closeEvent(event)
+
+    def _control_handlers(self) -> Dict[str, Callable[..., Any]]:
+        """Команды сервера управления; выполняются в потоке интерфейса."""
+        return {
+            "play": self._control_play,
+            "pause": self._control_pause,
+            "toggle": self._control_toggle,
+            "next": self.next_track,
+            "previous": self.previous_track,
+            "seek": self.seek,
+            "status": self._control_status,
+            "playlists": lambda: list(self.playlists),
+            "create_playlist": self._control_create_playlist,
+            "delete_playlist": self._control_delete_playlist,
+            "select_playlist": self._control_select_playlist,
+            "tracks": lambda playlist=None: [
+                composition_to_dict(track) for track in self._control_playlist(playlist)
+            ],
+            "add_tracks": lambda tracks, playlist=None: add_tracks(self._control_playlist(playlist), tracks),
+            "remove_tracks": lambda indexes, playlist=None: remove_tracks(self._control_playlist(playlist), indexes),
+            "move_tracks": lambda moves, playlist=None: move_tracks(self._control_playlist(playlist), moves),
+        }
+
+    def _control_playlist(self, name: Optional[str]) -> PlayList:
+        """Плейлист команды управления: указанный по имени или текущий."""
+        if name is None:
+            if self.current_playlist is None:
+                raise ValueError("No playlist selected")
+            return self.current_playlist
+        if name not in self.playlists:
+            raise ValueError(f"Unknown playlist: {name}")
+        return self.playlists[name]
+
+    def _control_play(self, index: Optional[int] = None) -> None:
+        """Воспроизвести трек по индексу или выбранный в списке."""
+        if not self.current_playlist or len(self.current_playlist) == 0:
+            raise ValueError("Playlist is empty")
+        if index is not None:
+            if not 0 <= index < len(self.current_playlist):
+                raise IndexError("Index out of range")
+            self.track_list.setCurrentRow(index)
+        # Ошибки возвращаются клиенту: модальный диалог остановил бы пакет команд
+        self._play_row(self.track_list.currentRow())
+
+    def _control_toggle(self) -> None:
+        """Переключить воспроизведение/паузу без диалогов об ошибках."""
+        if self.is_playing or (self.is_paused and self.current_playlist and self.current_playlist.current()):
+            self.toggle_play()
+        else:
+            self._control_play()
+
+    def _control_pause(self) -> None:
+        """Поставить воспроизведение на паузу."""
+        if self.is_playing:
+            self.toggle_play()
+
+    def _control_status(self) -> Dict[str, Any]:
+        """Состояние воспроизведения."""
+        playlist = self.current_playlist
+        track = playlist.current() if playlist else None
+        return {
+            "playlist": playlist.name if playlist else None,
+            "index": playlist.current_index() if playlist else None,
+            "track": composition_to_dict(track) if track else None,
+            "position": self.current_position,
+            "playing": self.is_playing,
+            "paused": self.is_paused,
+        }
+
+    def _control_create_playlist(self, name: str) -> None:
+        """Создать плейлист по команде управления."""
+        if name in self.playlists:
+            raise ValueError(f"Playlist already exists: {name}")
+        self._create_playlist(name)
+
+    def _control_delete_playlist(self, name: str) -> None:
+        """Удалить плейлист по команде управления."""
+        if name not in self.playlists:
+            raise ValueError(f"Unknown playlist: {name}")
+        self._delete_playlist(name)
+
+    def _control_select_playlist(self, name: str) -> None:
+        """Выбрать плейлист по команде управления."""
+        if name not in self.playlists:
+            raise ValueError(f"Unknown playlist: {name}")
+        self.playlist_combo.setCurrentText(name)
+
+    def _apply_gain(self, track: Composition) -> None:
+        """Установить громкость загруженного трека по результатам анализа."""
+        info = self.loudness.get(track.file_path)
+        if info is None:
+            pygame.mixer.music.set_volume(1.0)
+            self.loudness.request(track.file_path)
+        else:
+            pygame.mixer.music.set_volume(volume_for(info.gain_db))
+
     def _resume_track(self, track) -> None:
         """Возобновить воспроизведение трека."""
         if track.file_path and os.path.exists(track.file_path):
             try:
                 pygame.mixer.music.load(track.file_path)
+                self._apply_gain(track)
                 pygame.mixer.music.play(start=self.current_position)
                 self.is_paused = False
             except Exception:  # pylint: disable=broad-except
@@ -0,0 +1,180 @@
+"""Модуль для сбора статистики прослушивания композиций."""
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Deque, List, NamedTuple, Optional, Tuple
+
+from composition import Composition
+
+DEFAULT_STATS_PATH = os.path.join(os.path.expanduser("~"), ".music_player", "stats.db")
+
+# (вид события, ключ трека, название, исполнитель, время события, секунды прослушивания)
+_Event = Tuple[str, str, str, str, float, int]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS track_stats (
+    track_key TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    play_count INTEGER NOT NULL DEFAULT 0,
+    skip_count INTEGER NOT NULL DEFAULT 0,
+    listen_seconds INTEGER NOT NULL DEFAULT 0,
+    last_played REAL
+);
+CREATE INDEX IF NOT EXISTS idx_track_stats_play_count ON track_stats (play_count DESC);
+CREATE INDEX IF NOT EXISTS idx_track_stats_last_played ON track_stats (last_played DESC);
+"""
+
+_UPSERT = """
+INSERT INTO track_stats (track_key, title, artist, play_count, skip_count, listen_seconds, last_played)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (track_key) DO UPDATE SET
+    title = excluded.title,
+    artist = excluded.artist,
+    play_count = play_count + excluded.play_count,
+    skip_count = skip_count + excluded.skip_count,
+    listen_seconds = listen_seconds + excluded.listen_seconds,
+    last_played = COALESCE(MAX(last_played, excluded.last_played), last_played, excluded.last_played)
+"""
+
+
+class TrackStats(NamedTuple):
+    """Агрегированная статистика одной композиции."""
+
+    track_key: str
+    title: str
+    artist: str
+    play_count: int
+    skip_count: int
+    listen_seconds: int
+    last_played: Optional[float]
+
+
+def track_key(track: Composition) -> str:
+    """Получить ключ композиции для хранилища статистики."""
+    if track.file_path:
+        return track.file_path
+    return f"{track.artist}\x1f{track.title}"
+
+
+class PlayStatsStore:  # pylint: disable=too-many-instance-attributes
+    """Хранилище статистики с отложенной пакетной записью в SQLite.
+
+    События складываются в кольцевой буфер в памяти и сбрасываются в базу
+    фоновым потоком одной транзакцией, поэтому запись никогда не блокирует
+    воспроизведение. При переполнении буфера теряются самые старые события.
+    """
+
+    def __init__(self, path: str = DEFAULT_STATS_PATH, buffer_size: int = 4096,
+                 flush_interval: float = 5.0, batch_size: int = 256) -> None:
+        """Инициализация хранилища.
+
+        Args:
+            path: Путь к файлу базы данных
+            buffer_size: Вместимость кольцевого буфера событий
+            flush_interval: Период фонового сброса в секундах
+            batch_size: Количество событий, при котором сброс начинается досрочно
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._events: Deque[_Event] = deque(maxlen=buffer_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._worker = threading.Thread(target=self._run, name="play-stats-writer", daemon=True)
+        self._worker.start()
+
+    def record_play(self, track: Composition) -> None:
+        """Учесть начало воспроизведения композиции."""
+        self._push("play", track, 0)
+
+    def record_skip(self, track: Composition) -> None:
+        """Учесть пропуск композиции до её окончания."""
+        self._push("skip", track, 0)
+
+    def record_listen(self, track: Composition, seconds: int) -> None:
+        """Учесть время прослушивания композиции."""
+        if seconds > 0:
+            self._push("listen", track, seconds)
+
+    def _push(self, kind: str, track: Composition, seconds: int) -> None:
+        """Положить событие в буфер и при необходимости разбудить поток записи."""
+        if self._closed:
+            return
+        self._events.append((kind, track_key(track), track.title, track.artist, time.time(), seconds))
+        if len(self._events) >= self._batch_size:
+            self._wakeup.set()
+
+    def _run(self) -> None:
+        """Цикл фонового потока записи."""
+        while not self._closed:
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """Записать все накопленные события одной транзакцией."""
+        with self._lock:
+            batch = []
+            while self._events:
+                batch.append(self._events.popleft())
+            if not batch:
+                return
+            with self._conn:
+                self._conn.executemany(_UPSERT, self._aggregate(batch))
+
+    @staticmethod
+    def _aggregate(batch: List[_Event]) -> List[tuple]:
+        """Свернуть пакет событий в одну строку на композицию."""
+        rows: dict = {}
+        for kind, key, title, artist, timestamp, seconds in batch:
+            row = rows.setdefault(key, [key, title, artist, 0, 0, 0, None])
+            row[1], row[2] = title, artist
+            if kind == "play":
+                row[3] += 1
+                row[6] = timestamp if row[6] is None else max(row[6], timestamp)
+            elif kind == "skip":
+                row[4] += 1
+            else:
+                row[5] += seconds
+        return [tuple(row) for row in rows.values()]
+
+    def _query(self, sql: str, params: tuple) -> List[TrackStats]:
+        """Выполнить запрос к агрегатам, предварительно сбросив буфер."""
+        self.flush()
+        with self._lock:
+            return [TrackStats(*row) for row in self._conn.execute(sql, params)]
+
+    def get(self, track: Composition) -> Optional[TrackStats]:
+        """Получить статистику композиции."""
+        rows = self._query("SELECT * FROM track_stats WHERE track_key = ?", (track_key(track),))
+        return rows[0] if rows else None
+
+    def most_played(self, limit: int = 10) -> List[TrackStats]:
+        """Самые часто воспроизводимые композиции."""
+        return self._query(
+            "SELECT * FROM track_stats WHERE play_count > 0 ORDER BY play_count DESC LIMIT ?", (limit,)
+        )
+
+    def recently_played(self, limit: int = 10) -> List[TrackStats]:
+        """Недавно воспроизведённые композиции."""
+        return self._query(
+            "SELECT * FROM track_stats WHERE last_played IS NOT NULL ORDER BY last_played DESC LIMIT ?",
+            (limit,)
+        )
+
+    def close(self) -> None:
+        """Остановить поток записи и сохранить оставшиеся события."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._worker.join()
+        self.flush()
+        self._conn.close()
@@ -1,6 +1,8 @@
 """Модуль для работы с плейлистом."""
 
-from linked_list import LinkedList
+from typing import Optional
+
+from linked_list import LinkedList, LinkedListItem
 
 
 
@@ -21,22 +23,49 @@ class PlayList(LinkedList):
 
     def next_track(self):
         """Перейти к следующему треку."""
-        if self.current_item and self._size > 0:
-            self.current_item = self.current_item.next_item()
-            return self.current_item.track
-        return None
+        with self.lock:
+            if self.current_item and self._size > 0:
+                self.current_item = self.current_item.next_item()
+                self._notify("next")
+                return self.current_item.track
+            return None
 
     def previous_track(self):
         """Перейти к предыдущему треку."""
-        if self.current_item and self._size > 0:
-            self.current_item = self.current_item.previous_item()
-            return self.current_item.track
-        return None
+        with self.lock:
+            if self.current_item and self._size > 0:
+                self.current_item = self.current_item.previous_item()
+                self._notify("previous")
+                return self.current_item.track
+            return None
 
     def current(self):
         """Получить текущую композицию."""
-        if self.current_item:
-            return self.current_item.track
+        current_item = self.current_item
+        if current_item:
+            return current_item.track
         return None
 
+    def set_current(self, index: int):
+        """Сделать текущей композицию с индексом index."""
+        with self.lock:
+            self.current_item = self._node_at(index)
+            self._notify("current", index)
+            return self.current_item.track
+
+    def current_index(self) -> Optional[int]:
+        """Получить индекс текущей композиции."""
+        with self.lock:
+            node = self.first_item
+            for index in range(self._size):
+                if node is self.current_item:
+                    return index
+                node = node.next_item()
+            return None
 
+    def _unlink(self, node: LinkedListItem) -> None:
+        """Исключение узла с переводом текущей позиции на следующий трек."""
+        if node is self.current_item:
+            self.current_item = node.next_item() if self._size > 1 else None
+            self._notify("current_removed")
+        super()._unlink(node)
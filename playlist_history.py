@@ -0,0 +1,208 @@
+"""Модуль истории правок плейлиста: отмена, повтор и неизменяемые снимки."""
+from typing import Any, Iterator, List, Optional, Tuple
+
+from linked_list import LinkedList
+
+# (операция, *аргументы) в формате оповещений LinkedList
+_Operation = Tuple[Any, ...]
+
+
+def _apply_to_list(items: List[Any], operation: _Operation) -> None:
+    """Применить операцию LinkedList к обычному списку."""
+    kind = operation[0]
+    if kind == "append":
+        items.append(operation[1])
+    elif kind == "insert":
+        items.insert(operation[1], operation[2])
+    elif kind == "remove":
+        del items[operation[1]]
+    elif kind == "move":
+        items.insert(operation[2], items.pop(operation[1]))
+    elif kind == "replace":
+        items[operation[1]] = operation[2]
+
+
+class PlaylistSnapshot:
+    """Неизменяемый снимок плейлиста на момент создания.
+
+    Снимок хранит ссылки на базовый кортеж и журнал операций истории, поэтому
+    создаётся за O(1). Содержимое собирается при первом обращении, что можно
+    делать в фоновом потоке: сам список при этом не читается.
+    """
+
+    def __init__(self, base: Tuple[Any, ...], log: List[_Operation], count: int) -> None:
+        """Инициализация снимка.
+
+        Args:
+            base: Содержимое плейлиста на момент начала журнала
+            log: Журнал операций после base
+            count: Количество операций журнала, вошедших в снимок
+        """
+        self._base = base
+        self._log = log
+        self._count = count
+        self._items: Optional[Tuple[Any, ...]] = None if count else base
+
+    def items(self) -> Tuple[Any, ...]:
+        """Содержимое снимка."""
+        if self._items is None:
+            items = list(self._base)
+            for operation in self._log[:self._count]:
+                _apply_to_list(items, operation)
+            self._items = tuple(items)
+        return self._items
+
+    def __iter__(self) -> Iterator[Any]:
+        """Обход элементов снимка."""
+        return iter(self.items())
+
+    def __len__(self) -> int:
+        """Количество элементов в снимке."""
+        return len(self.items())
+
+    def __getitem__(self, index: int) -> Any:
+        """Получение элемента снимка по индексу."""
+        return self.items()[index]
+
+
+class PlaylistHistory:  # pylint: disable=too-many-instance-attributes
+    """История правок списка с неограниченной отменой и повтором.
+
+    Для каждой правки запоминается обратная операция постоянного размера,
+    а не копия списка. Правки, сделанные в обход истории, тоже попадают
+    в неё, так как история подписана на оповещения списка. Правки внутри
+    LinkedList.batch(), например пакетное удаление, отменяются одним шагом.
+    """
+
+    def __init__(self, linked_list: LinkedList) -> None:
+        """Инициализация истории.
+
+        Args:
+            linked_list: Отслеживаемый список
+        """
+        self.linked_list = linked_list
+        self._undo: List[_Operation] = []
+        self._redo: List[_Operation] = []
+        self._replaying: Optional[List[_Operation]] = None
+        self._base: Tuple[Any, ...] = tuple(linked_list)
+        self._log: List[_Operation] = []
+        self._group: Optional[List[_Operation]] = None
+        self._group_depth = 0
+        self._removed_current = False
+        linked_list.add_observer(self._record)
+
+    def _record(self, operation: str, *args) -> None:
+        """Запомнить правку и обратную к ней операцию."""
+        if operation == "begin":
+            self._group_depth += 1
+            if self._group_depth == 1:
+                self._group = []
+            return
+        if operation == "end":
+            self._group_depth -= 1
+            if self._group_depth == 0:
+                group, self._group = self._group, None
+                if len(group) == 1:
+                    self._push(group[0])
+                elif group:
+                    self._push(("group", group))
+            return
+        if operation == "current_removed":
+            self._removed_current = True
+            return
+        if operation not in ("append", "insert", "remove", "move", "replace"):
+            return
+        self._log.append((operation, *args))
+        if len(self._log) > max(len(self._base), 64):
+            # Перенос базы за O(n) раз в n операций: амортизированно O(1) на правку.
+            # Оповещение приходит после изменения, поэтому снимок списка уже
+            # включает операцию.
+            self._base = self.linked_list.snapshot()
+            self._log = []
+
+        inverse = self._inverse(operation, args)
+        if self._group is not None:
+            self._group.append(inverse)
+        else:
+            self._push(inverse)
+
+    def _push(self, inverse: _Operation) -> None:
+        """Положить обратную операцию в стек отмены или повтора."""
+        if self._replaying is not None:
+            self._replaying.append(inverse)
+        else:
+            self._undo.append(inverse)
+            self._redo.clear()
+
+    def _inverse(self, operation: str, args: tuple) -> _Operation:
+        """Операция, отменяющая правку."""
+        if operation == "append":
+            return ("remove", len(self.linked_list) - 1)
+        if operation == "insert":
+            return ("remove", args[0])
+        if operation == "remove":
+            # Удалённый текущий трек после отмены снова становится текущим
+            was_current, self._removed_current = self._removed_current, False
+            return ("insert", args[0], args[1], was_current)
+        if operation == "replace":
+            return ("replace", args[0], args[2])
+        return ("move", args[1], args[0])
+
+    def _apply(self, operation: _Operation, target: List[_Operation]) -> None:
+        """Применить операцию к списку, направив её обратную в target."""
+        self._replaying = target
+        try:
+            if operation[0] == "group":
+                # Обратные операции группы применяются в обратном порядке и
+                # сами собираются в группу для повтора
+                with self.linked_list.batch():
+                    for inverse in reversed(operation[1]):
+                        self._apply_one(inverse)
+            else:
+                self._apply_one(operation)
+        finally:
+            self._replaying = None
+
+    def _apply_one(self, operation: _Operation) -> None:
+        """Применить к списку одну операцию."""
+        kind = operation[0]
+        if kind == "insert":
+            self.linked_list.insert(operation[1], operation[2])
+            if operation[3] and hasattr(self.linked_list, "set_current"):
+                self.linked_list.set_current(operation[1])
+        elif kind == "remove":
+            self.linked_list.remove_at(operation[1])
+        elif kind == "replace":
+            self.linked_list.replace(operation[1], operation[2])
+        else:
+            self.linked_list.move(operation[1], operation[2])
+    def can_undo(self) -> bool:
+        """Есть ли правки для отмены."""
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        """Есть ли отменённые правки для повтора."""
+        return bool(self._redo)
+
+    def undo(self) -> bool:
+        """Отменить последнюю правку."""
+        if not self._undo:
+            return False
+        self._apply(self._undo.pop(), self._redo)
+        return True
+
+    def redo(self) -> bool:
+        """Повторить последнюю отменённую правку."""
+        if not self._redo:
+            return False
+        self._apply(self._redo.pop(), self._undo)
+        return True
+
+    def snapshot(self) -> PlaylistSnapshot:
+        """Получить неизменяемый снимок текущего состояния за O(1)."""
+        with self.linked_list.lock:
+            return PlaylistSnapshot(self._base, self._log, len(self._log))
+
+    def close(self) -> None:
+        """Прекратить отслеживание правок."""
+        self.linked_list.remove_observer(self._record)
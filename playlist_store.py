@@ -0,0 +1,599 @@
+"""Модуль для хранения плейлистов на диске в виде снимка и журнала операций."""
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Callable, Collection, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, TextIO
+from urllib.parse import quote, unquote
+
+from composition import Composition
+from playlist import PlayList
+
+DEFAULT_PLAYLISTS_PATH = os.path.join(os.path.expanduser("~"), ".music_player", "playlists")
+
+_SNAPSHOT_FILE = "snapshot.json"
+_CATALOG_FILE = "catalog.json"
+_PATHS_FILE = "paths.json"
+_JOURNAL_PREFIX = "journal."
+_JOURNAL_SUFFIX = ".jsonl"
+
+
+def composition_to_dict(track: Composition) -> dict:
+    """Преобразовать композицию в словарь для сохранения."""
+    return {
+        "title": track.title,
+        "artist": track.artist,
+        "duration": track.duration,
+        "file_path": track.file_path,
+    }
+
+
+def composition_from_dict(data: dict) -> Composition:
+    """Восстановить композицию из словаря."""
+    return Composition(data["title"], data["artist"], data.get("duration", 0), data.get("file_path", ""))
+
+
+def relocate_tracks(playlist: PlayList, moved: Mapping[str, str], removed: Collection[str]) -> int:
+    """Обновить пути перемещённых файлов и убрать треки удалённых.
+
+    Замены выполняются за один проход по списку, удаления — одним проходом
+    remove_many, так что пакет изменений стоит O(n) независимо от его размера.
+
+    Args:
+        playlist: Плейлист
+        moved: Новые пути файлов по прежним
+        removed: Пути удалённых файлов
+
+    Returns:
+        Количество изменённых треков
+    """
+    if not moved and not removed:
+        return 0
+    with playlist.batch():
+        replaced = playlist.replace_each(
+            lambda track: Composition(track.title, track.artist, track.duration, moved[track.file_path])
+            if track.file_path in moved else None
+        )
+        removals = [index for index, track in enumerate(playlist.snapshot()) if track.file_path in removed]
+        playlist.remove_many(removals)
+    return replaced + len(removals)
+
+
+def _common(paths: Collection[str], index: Collection[str]) -> List[str]:
+    """Пути, входящие в обе коллекции; обход идёт по меньшей из них."""
+    if len(paths) <= len(index):
+        return [path for path in paths if path in index]
+    return [path for path in index if path in paths]
+
+
+def _write_json_atomic(path: str, data: dict) -> None:
+    """Записать JSON через временный файл и атомарную замену."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class PlaylistJournal:  # pylint: disable=too-many-instance-attributes
+    """Журнал изменений одного плейлиста.
+
+    Каждое изменение плейлиста дописывается в конец текущего сегмента
+    журнала одной строкой JSON, поэтому сохранение стоит O(1) на правку.
+    Когда число операций в журнале достигает max(compact_every, длина
+    плейлиста), журнал переключается на новый сегмент, а состояние плейлиста в фоновом потоке записывается в снимок, после чего
+    покрытые снимком сегменты удаляются. Снимок стоит O(n) раз в n правок,
+    то есть амортизированно O(1) на правку. Восстановление — загрузка снимка
+    и повтор операций из оставшихся сегментов.
+    """
+
+    def __init__(self, directory: str, compact_every: int = 1000) -> None:
+        """Инициализация журнала.
+
+        Args:
+            directory: Каталог с файлами плейлиста
+            compact_every: Наименьшее количество операций между уплотнениями
+        """
+        self.directory = directory
+        self.compact_every = compact_every
+        self._playlist: Optional[PlayList] = None
+        self._segment = 0
+        self._file: Optional[TextIO] = None
+        self._pending_ops = 0
+        self._batch_depth = 0
+        self._compactor: Optional[threading.Thread] = None
+
+    def _segments(self) -> List[int]:
+        """Номера существующих сегментов журнала по возрастанию."""
+        numbers = []
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith(_JOURNAL_PREFIX) and file_name.endswith(_JOURNAL_SUFFIX):
+                number = file_name[len(_JOURNAL_PREFIX):-len(_JOURNAL_SUFFIX)]
+                if number.isdigit():
+                    numbers.append(int(number))
+        return sorted(numbers)
+
+    def _segment_path(self, number: int) -> str:
+        """Путь к сегменту журнала."""
+        return os.path.join(self.directory, f"{_JOURNAL_PREFIX}{number}{_JOURNAL_SUFFIX}")
+
+    def load(self, name: str) -> PlayList:
+        """Восстановить плейлист из снимка и журнала и начать запись изменений."""
+        os.makedirs(self.directory, exist_ok=True)
+        playlist = PlayList(name)
+        snapshot_segment = -1
+        current = None
+        snapshot_path = os.path.join(self.directory, _SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, encoding="utf-8") as file:
+                snapshot = json.load(file)
+            snapshot_segment = snapshot["segment"]
+            for data in snapshot["tracks"]:
+                playlist.append(composition_from_dict(data))
+            current = snapshot.get("current")
+        if current is not None:
+            playlist.set_current(current)
+
+        segments = self._segments()
+        for number in segments:
+            if number > snapshot_segment:
+                self._replay(playlist, self._segment_path(number))
+        self._segment = max(segments + [snapshot_segment]) + 1
+        self.attach(playlist)
+        return playlist
+
+    @staticmethod
+    def _replay(playlist: PlayList, path: str) -> None:
+        """Повторить операции из сегмента журнала."""
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    operation = json.loads(line)
+                except ValueError:
+                    # Недописанная строка после аварийного завершения
+                    break
+                kind = operation[0]
+                if kind == "append":
+                    playlist.append(composition_from_dict(operation[1]))
+                elif kind == "insert":
+                    playlist.insert(operation[1], composition_from_dict(operation[2]))
+                elif kind == "remove":
+                    playlist.remove_at(operation[1])
+                elif kind == "move":
+                    playlist.move(operation[1], operation[2])
+                elif kind == "replace":
+                    playlist.replace(operation[1], composition_from_dict(operation[2]))
+                elif kind == "current":
+                    playlist.set_current(operation[1])
+                elif kind == "next":
+                    playlist.next_track()
+                elif kind == "previous":
+                    playlist.previous_track()
+                elif kind == "relocate":
+                    relocate_tracks(playlist, operation[1], set(operation[2]))
+
+    def write_offline(self, operation: list) -> None:
+        """Записать операцию в журнал незагруженного плейлиста.
+
+        Операция пишется в отдельный новый сегмент, который будет повторён
+        при следующей загрузке плейлиста.
+        """
+        segments = self._segments()
+        snapshot_path = os.path.join(self.directory, _SNAPSHOT_FILE)
+        if segments:
+            number = segments[-1] + 1
+        elif os.path.exists(snapshot_path):
+            with open(snapshot_path, encoding="utf-8") as file:
+                number = json.load(file)["segment"] + 1
+        else:
+            number = 0
+        tmp_path = self._segment_path(number) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(json.dumps(operation, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self._segment_path(number))
+
+    def attach(self, playlist: PlayList) -> None:
+        """Начать запись изменений плейлиста в журнал."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._playlist = playlist
+        self._open_segment()
+        playlist.add_observer(self._record)
+
+    def _open_segment(self) -> None:
+        """Открыть новый сегмент журнала для дозаписи."""
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self._segment_path(self._segment), "a", encoding="utf-8")  # pylint: disable=consider-using-with
+
+    def _record(self, operation: str, *args) -> None:
+        """Дописать операцию в журнал."""
+        # Операции пакета сбрасываются на диск один раз, по его завершении
+        if operation == "begin":
+            self._batch_depth += 1
+            return
+        if operation == "end":
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._file.flush()
+            return
+        if operation == "current_removed":
+            return
+        if operation == "append":
+            args = (composition_to_dict(args[0]),)
+        elif operation == "insert":
+            args = (args[0], composition_to_dict(args[1]))
+        elif operation == "remove":
+            args = args[:1]
+        elif operation == "replace":
+            args = (args[0], composition_to_dict(args[1]))
+        self._file.write(json.dumps([operation, *args], ensure_ascii=False) + "\n")
+        if not self._batch_depth:
+            self._file.flush()
+        self._pending_ops += 1
+        if self._pending_ops >= max(self.compact_every, len(self._playlist)):
+            self.compact()
+
+    def compact(self, wait: bool = False) -> None:
+        """Переключить сегмент и записать снимок плейлиста в фоне.
+
+        Args:
+            wait: Дождаться окончания записи снимка
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            if not wait:
+                return
+            self._compactor.join()
+        tracks = list(self._playlist)
+        current = self._playlist.current_index()
+        covered_segment = self._segment
+        self._segment += 1
+        self._open_segment()
+        self._pending_ops = 0
+        self._compactor = threading.Thread(
+            target=self._write_snapshot, args=(tracks, current, covered_segment),
+            name="playlist-compactor", daemon=True
+        )
+        self._compactor.start()
+        if wait:
+            self._compactor.join()
+
+    def _write_snapshot(self, tracks: List[Composition], current: Optional[int], covered_segment: int) -> None:
+        """Записать снимок и удалить покрытые им сегменты журнала."""
+        _write_json_atomic(os.path.join(self.directory, _SNAPSHOT_FILE), {
+            "segment": covered_segment,
+            "tracks": [composition_to_dict(track) for track in tracks],
+            "current": current,
+        })
+        for number in self._segments():
+            if number <= covered_segment:
+                os.remove(self._segment_path(number))
+
+    def close(self) -> None:
+        """Завершить уплотнение и закрыть журнал."""
+        if self._compactor is not None:
+            self._compactor.join()
+        if self._playlist is not None:
+            self._playlist.remove_observer(self._record)
+            self._playlist = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class PlaylistInfo(NamedTuple):
+    """Краткие сведения о плейлисте из каталога."""
+
+    name: str
+    track_count: int
+    total_duration: int
+
+
+class PlaylistStore:
+    """Каталог сохранённых плейлистов, по подкаталогу на плейлист.
+
+    Рядом с плейлистами хранится файл каталога с количеством треков и общей
+    длительностью каждого из них, чтобы при запуске не читать сами плейлисты.
+    Каталог обновляется при открытии, выгрузке и закрытии плейлистов.
+
+    При выгрузке в каталог плейлиста также пишется индекс путей его файлов
+    с количеством и длительностью треков, по которому перемещения и удаления
+    файлов дописываются только в журналы затронутых плейлистов. Пока плейлист
+    открыт, индекс удалён; без индекса изменения пишутся в журнал всегда.
+    Методы хранилища можно вызывать из разных потоков.
+    """
+
+    def __init__(self, root: str = DEFAULT_PLAYLISTS_PATH, compact_every: int = 1000) -> None:
+        """Инициализация хранилища.
+
+        Args:
+            root: Корневой каталог плейлистов
+            compact_every: Количество операций между уплотнениями журнала
+        """
+        self.root = root
+        self.compact_every = compact_every
+        self._journals: Dict[str, PlaylistJournal] = {}
+        # Индексы путей незагруженных плейлистов: путь -> [треков, длительность]
+        self._paths: Dict[str, Optional[Dict[str, List[int]]]] = {}
+        self._lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+        self._catalog: Dict[str, List[int]] = {}
+        catalog_path = os.path.join(root, _CATALOG_FILE)
+        if os.path.exists(catalog_path):
+            with open(catalog_path, encoding="utf-8") as file:
+                self._catalog = json.load(file)
+
+    def _directory(self, name: str) -> str:
+        """Каталог плейлиста с указанным названием."""
+        return os.path.join(self.root, quote(name, safe=""))
+
+    def names(self) -> List[str]:
+        """Названия сохранённых плейлистов."""
+        return sorted(unquote(entry) for entry in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, entry)))
+
+    def info(self, name: str) -> PlaylistInfo:
+        """Сведения о плейлисте из каталога без его загрузки."""
+        track_count, total_duration = self._catalog.get(name, (0, 0))
+        return PlaylistInfo(name, track_count, total_duration)
+
+    def _update_catalog(self, playlist: PlayList) -> None:
+        """Обновить запись каталога по загруженному плейлисту."""
+        self._catalog[playlist.name] = [len(playlist), sum(track.duration for track in playlist)]
+
+    def _save_catalog(self) -> None:
+        """Записать каталог на диск."""
+        _write_json_atomic(os.path.join(self.root, _CATALOG_FILE), self._catalog)
+
+    def open(self, name: str) -> PlayList:
+        """Загрузить плейлист и подключить к нему журнал."""
+        with self._lock:
+            if name in self._journals:
+                raise ValueError(f"Playlist '{name}' is already open")
+            journal = PlaylistJournal(self._directory(name), self.compact_every)
+            playlist = journal.load(name)
+            self._journals[name] = journal
+            # Индекс путей устареет после правок: до выгрузки его нет
+            self._paths.pop(name, None)
+            paths_path = os.path.join(self._directory(name), _PATHS_FILE)
+            if os.path.exists(paths_path):
+                os.remove(paths_path)
+            self._update_catalog(playlist)
+            return playlist
+
+    def create(self, name: str) -> PlayList:
+        """Создать пустой сохраняемый плейлист."""
+        with self._lock:
+            if os.path.exists(self._directory(name)):
+                raise ValueError(f"Playlist '{name}' already exists")
+            playlist = self.open(name)
+            self._save_catalog()
+            return playlist
+
+    def release(self, name: str, playlist: PlayList) -> None:
+        """Выгрузить плейлист, сохранив его сведения в каталоге и индекс путей."""
+        with self._lock:
+            self._update_catalog(playlist)
+            self._journals.pop(name).close()
+            self._save_paths(name, playlist)
+            self._save_catalog()
+
+    def _save_paths(self, name: str, playlist: PlayList) -> None:
+        """Записать индекс путей выгружаемого плейлиста."""
+        paths: Dict[str, List[int]] = {}
+        for track in playlist:
+            entry = paths.setdefault(track.file_path, [0, 0])
+            entry[0] += 1
+            entry[1] += track.duration
+        _write_json_atomic(os.path.join(self._directory(name), _PATHS_FILE), paths)
+        self._paths[name] = paths
+
+    def _load_paths(self, name: str) -> Optional[Dict[str, List[int]]]:
+        """Индекс путей незагруженного плейлиста или None, если его нет."""
+        if name not in self._paths:
+            paths_path = os.path.join(self._directory(name), _PATHS_FILE)
+            paths = None
+            if os.path.exists(paths_path):
+                with open(paths_path, encoding="utf-8") as file:
+                    paths = json.load(file)
+            self._paths[name] = paths
+        return self._paths[name]
+
+    def relocate_unloaded(self, moved: Mapping[str, str], removed: Collection[str]) -> List[str]:
+        """Записать перемещения и удаления файлов в журналы затронутых незагруженных плейлистов.
+
+        Изменения применяются при следующей загрузке, без чтения плейлистов сейчас.
+
+        Returns:
+            Названия открытых плейлистов: к ним изменения нужно применить в памяти
+        """
+        with self._lock:
+            opened = []
+            for name in self.names():
+                if name in self._journals:
+                    opened.append(name)
+                else:
+                    self.relocate(name, moved, removed)
+            return opened
+
+    def relocate(self, name: str, moved: Mapping[str, str], removed: Collection[str]) -> bool:
+        """Записать перемещения и удаления файлов в журнал незагруженного плейлиста.
+
+        Returns:
+            Затронуты ли треки плейлиста
+        """
+        with self._lock:
+            if name in self._journals:
+                raise ValueError(f"Playlist '{name}' is open")
+            paths = self._load_paths(name)
+            if paths is not None:
+                moved = {path: moved[path] for path in _common(moved, paths)}
+                removed = _common(removed, paths)
+                if not moved and not removed:
+                    return False
+            PlaylistJournal(self._directory(name)).write_offline(["relocate", dict(moved), sorted(removed)])
+            if paths is not None:
+                self._relocate_paths(name, paths, moved, removed)
+            return True
+
+    def _relocate_paths(self, name: str, paths: Dict[str, List[int]],
+                        moved: Mapping[str, str], removed: Iterable[str]) -> None:
+        """Обновить индекс путей и каталог после записи изменений в журнал."""
+        track_count, total_duration = self._catalog.get(name, (0, 0))
+        for path in removed:
+            count, duration = paths.pop(path)
+            track_count -= count
+            total_duration -= duration
+        for old_path, new_path in moved.items():
+            entry = paths.pop(old_path)
+            target = paths.setdefault(new_path, [0, 0])
+            target[0] += entry[0]
+            target[1] += entry[1]
+        _write_json_atomic(os.path.join(self._directory(name), _PATHS_FILE), paths)
+        self._catalog[name] = [track_count, total_duration]
+        self._save_catalog()
+
+    def delete(self, name: str) -> None:
+        """Удалить плейлист с диска."""
+        with self._lock:
+            journal = self._journals.pop(name, None)
+            if journal is not None:
+                journal.close()
+            self._paths.pop(name, None)
+            shutil.rmtree(self._directory(name), ignore_errors=True)
+            if self._catalog.pop(name, None) is not None:
+                self._save_catalog()
+
+    def close(self, playlists: Optional[Dict[str, PlayList]] = None) -> None:
+        """Закрыть журналы всех открытых плейлистов.
+
+        Args:
+            playlists: Загруженные плейлисты для обновления каталога и индекса путей
+        """
+        with self._lock:
+            for journal in self._journals.values():
+                journal.close()
+            self._journals.clear()
+            for name, playlist in (playlists or {}).items():
+                self._update_catalog(playlist)
+                self._save_paths(name, playlist)
+            self._save_catalog()
+
+
+class LazyPlaylists:
+    """Коллекция плейлистов с загрузкой по требованию.
+
+    Изначально известны только названия и сведения из каталога. Плейлист
+    читается с диска при первом обращении, а давно не использовавшиеся
+    плейлисты выгружаются, когда суммарное число загруженных треков
+    превышает max_loaded_tracks. Последний запрошенный и активный плейлисты
+    не выгружаются: их объекты продолжают использоваться и изменяться.
+    """
+
+    def __init__(self, store: PlaylistStore, max_loaded_tracks: int = 500_000,
+                 on_evict: Optional[Callable[[str, PlayList], None]] = None) -> None:
+        """Инициализация коллекции.
+
+        Args:
+            store: Хранилище плейлистов
+            max_loaded_tracks: Предел суммарного числа треков в памяти
+            on_evict: Вызывается как on_evict(название, плейлист) при выгрузке,
+                чтобы освободить связанные с плейлистом объекты
+        """
+        self.store = store
+        self.max_loaded_tracks = max_loaded_tracks
+        self.on_evict = on_evict
+        self._names = store.names()
+        self._loaded: 'OrderedDict[str, PlayList]' = OrderedDict()
+        # Название плейлиста, открытого в интерфейсе
+        self.active: Optional[str] = None
+
+    def __contains__(self, name: object) -> bool:
+        """Проверка наличия плейлиста."""
+        return name in self._names
+
+    def __iter__(self) -> Iterator[str]:
+        """Обход названий плейлистов."""
+        return iter(list(self._names))
+
+    def __len__(self) -> int:
+        """Количество плейлистов."""
+        return len(self._names)
+
+    def __getitem__(self, name: str) -> PlayList:
+        """Получить плейлист, загрузив его при необходимости."""
+        if name not in self._names:
+            raise KeyError(name)
+        if name in self._loaded:
+            self._loaded.move_to_end(name)
+        else:
+            self._loaded[name] = self.store.open(name)
+            self._evict()
+        return self._loaded[name]
+
+    def __delitem__(self, name: str) -> None:
+        """Удалить плейлист."""
+        if name not in self._names:
+            raise KeyError(name)
+        self._names.remove(name)
+        self._loaded.pop(name, None)
+        if self.active == name:
+            self.active = None
+        self.store.delete(name)
+
+    def create(self, name: str) -> PlayList:
+        """Создать новый плейлист."""
+        playlist = self.store.create(name)
+        self._names.append(name)
+        self._loaded[name] = playlist
+        self._evict()
+        return playlist
+
+    def info(self, name: str) -> PlaylistInfo:
+        """Сведения о плейлисте без его загрузки."""
+        if name in self._loaded:
+            playlist = self._loaded[name]
+            return PlaylistInfo(name, len(playlist), sum(track.duration for track in playlist))
+        return self.store.info(name)
+
+    def loaded(self) -> List[PlayList]:
+        """Загруженные в память плейлисты."""
+        return list(self._loaded.values())
+
+    def is_loaded(self, name: str) -> bool:
+        """Проверка, загружен ли плейлист в память."""
+        return name in self._loaded
+
+    def relocate(self, names: Iterable[str], moved: Mapping[str, str], removed: Collection[str]) -> None:
+        """Применить перемещения и удаления файлов к плейлистам, открытым в хранилище.
+
+        Вызывается в потоке интерфейса с результатом PlaylistStore.relocate_unloaded.
+        Плейлист, выгруженный после того вызова, получает изменения через журнал.
+        """
+        for name in names:
+            if name in self._loaded:
+                relocate_tracks(self._loaded[name], moved, removed)
+            elif name in self._names:
+                self.store.relocate(name, moved, removed)
+
+    def _evict(self) -> None:
+        """Выгрузить давно не использовавшиеся плейлисты сверх предела."""
+        loaded_tracks = sum(len(playlist) for playlist in self._loaded.values())
+        for name in list(self._loaded)[:-1]:
+            if loaded_tracks <= self.max_loaded_tracks:
+                break
+            if name == self.active:
+                continue
+            playlist = self._loaded.pop(name)
+            loaded_tracks -= len(playlist)
+            self.store.release(name, playlist)
+            if self.on_evict is not None:
+                self.on_evict(name, playlist)
+
+    def close(self) -> None:
+        """Закрыть все загруженные плейлисты."""
+        self.store.close(dict(self._loaded))
+        self._loaded.clear()
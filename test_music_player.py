@@ -1,8 +1,28 @@
 """Тесты для музыкального плейера."""
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import socket
+import stat
+import struct
+import tempfile
+import threading
 import unittest
+import wave
 from composition import Composition
 from playlist import PlayList
 from linked_list import LinkedList
+from play_stats import PlayStatsStore
+from playlist_store import LazyPlaylists, PlaylistStore
+from playlist_history import PlaylistHistory
+from gui_dispatcher import GuiDispatcher
+from waveform import NUMPY_AVAILABLE, WaveformCache, wav_peaks
+from loudness import LoudnessAnalyzer, analyze_file, volume_for
+from library_watcher import LibraryChanges, LibraryWatcher, apply_to_playlist
+from control_server import ControlClient, ControlServer, add_tracks, move_tracks, prepare_tracks, remove_tracks
 
 
 class TestComposition(unittest.TestCase):
@@ -64,6 +84,48 @@ class TestLinkedList(unittest.TestCase):
         self.assertEqual(self.linked_list[0], "item1")
         self.assertEqual(self.linked_list[1], "item2")
 
+    def test_move(self) -> None:
+        """Тест перемещения элемента."""
+        for item in ("a", "b", "c", "d"):
+            self.linked_list.append(item)
+        self.linked_list.move(0, 3)
+        self.assertEqual(list(self.linked_list), ["b", "c", "d", "a"])
+        self.linked_list.move(3, 1)
+        self.assertEqual(list(self.linked_list), ["b", "a", "c", "d"])
+        self.assertEqual(self.linked_list.first_item.previous_item().track, "d")
+
+    def test_remove_many(self) -> None:
+        """Тест удаления нескольких элементов за один проход."""
+        for item in range(10):
+            self.linked_list.append(item)
+        self.assertEqual(self.linked_list.remove_many([0, 9, 4, 5, 4]), [9, 5, 4, 0])
+        self.assertEqual(list(self.linked_list), [1, 2, 3, 6, 7, 8])
+        self.assertEqual(self.linked_list.first_item.previous_item().track, 8)
+        with self.assertRaises(IndexError):
+            self.linked_list.remove_many([6])
+
+    def test_replace_each(self) -> None:
+        """Тест замены элементов за один проход."""
+        operations = []
+        for item in range(5):
+            self.linked_list.append(item)
+        self.linked_list.add_observer(lambda *operation: operations.append(operation))
+        self.assertEqual(self.linked_list.replace_each(lambda item: item * 10 if item % 2 else None), 2)
+        self.assertEqual(list(self.linked_list), [0, 10, 2, 30, 4])
+        self.assertEqual(operations, [("begin",), ("replace", 1, 10, 1), ("replace", 3, 30, 3), ("end",)])
+
+    def test_observer(self) -> None:
+        """Тест оповещения об изменениях."""
+        operations = []
+        self.linked_list.add_observer(lambda *operation: operations.append(operation))
+        self.linked_list.append("item1")
+        self.linked_list.append("item2")
+        self.linked_list.move(1, 0)
+        self.linked_list.remove("item1")
+        self.assertEqual(operations, [
+            ("append", "item1"), ("append", "item2"), ("move", 1, 0), ("remove", 1, "item1")
+        ])
+
 
 class TestPlayList(unittest.TestCase):
     """Тесты для класса PlayList."""
@@ -105,5 +167,817 @@ class TestPlayList(unittest.TestCase):
         self.assertEqual(prev_track, self.comp1)
 
 
+class TestPlayStatsStore(unittest.TestCase):
+    """Тесты для хранилища статистики прослушивания."""
+
+    def setUp(self) -> None:
+        """Подготовка к тестам."""
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.db_path = os.path.join(self.tmp_dir.name, "stats.db")
+        self.store = PlayStatsStore(self.db_path, flush_interval=60)
+        self.comp1 = Composition("Song1", "Artist1", 100)
+        self.comp2 = Composition("Song2", "Artist2", 200)
+
+    def tearDown(self) -> None:
+        """Освобождение ресурсов."""
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def test_counts_and_listen_time(self) -> None:
+        """Тест подсчёта воспроизведений, пропусков и времени."""
+        self.store.record_play(self.comp1)
+        self.store.record_listen(self.comp1, 30)
+        self.store.record_skip(self.comp1)
+        self.store.record_play(self.comp1)
+        self.store.record_listen(self.comp1, 100)
+
+        stats = self.store.get(self.comp1)
+        self.assertEqual(stats.play_count, 2)
+        self.assertEqual(stats.skip_count, 1)
+        self.assertEqual(stats.listen_seconds, 130)
+        self.assertIsNotNone(stats.last_played)
+        self.assertIsNone(self.store.get(self.comp2))
+
+    def test_most_and_recently_played(self) -> None:
+        """Тест запросов самых популярных и недавних треков."""
+        self.store.record_play(self.comp1)
+        self.store.record_play(self.comp1)
+        self.store.record_play(self.comp2)
+
+        most = self.store.most_played()
+        self.assertEqual([row.title for row in most], ["Song1", "Song2"])
+        recent = self.store.recently_played(1)
+        self.assertEqual([row.title for row in recent], ["Song2"])
+
+    def test_persisted_on_close(self) -> None:
+        """Тест сохранения буфера при закрытии."""
+        self.store.record_play(self.comp2)
+        self.store.close()
+
+        self.store = PlayStatsStore(self.db_path, flush_interval=60)
+        self.assertEqual(self.store.get(self.comp2).play_count, 1)
+
+
+class TestPlaylistStore(unittest.TestCase):
+    """Тесты для хранилища плейлистов с журналом."""
+
+    def setUp(self) -> None:
+        """Подготовка к тестам."""
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.tracks = [Composition(f"Song{i}", "Artist", 60 + i) for i in range(10)]
+
+    def tearDown(self) -> None:
+        """Освобождение ресурсов."""
+        self.tmp_dir.cleanup()
+
+    def _edit(self, playlist: PlayList) -> None:
+        """Набор правок плейлиста."""
+        for track in self.tracks:
+            playlist.append(track)
+        playlist.remove_at(2)
+        playlist.move(0, 5)
+        playlist.replace(1, Composition("Renamed", "Artist", 60, "/music/renamed.mp3"))
+        playlist.set_current(3)
+        playlist.next_track()
+
+    def _reopen(self, compact_every: int = 1000) -> PlayList:
+        """Открыть плейлист заново, как после перезапуска."""
+        store = PlaylistStore(self.tmp_dir.name, compact_every)
+        playlist = store.open("Мой плейлист")
+        store.close()
+        return playlist
+
+    def test_replay_journal(self) -> None:
+        """Тест восстановления порядка и текущего трека из журнала."""
+        store = PlaylistStore(self.tmp_dir.name)
+        playlist = store.create("Мой плейлист")
+        self._edit(playlist)
+        expected = list(playlist)
+        expected_current = playlist.current()
+        # Без close(): имитация аварийного завершения
+
+        restored = self._reopen()
+        self.assertEqual(list(restored), expected)
+        self.assertEqual(restored.current(), expected_current)
+        self.assertEqual(self._reopen().current_index(), 4)
+        store.close()
+
+    def test_compaction(self) -> None:
+        """Тест уплотнения журнала в снимок."""
+        store = PlaylistStore(self.tmp_dir.name, compact_every=4)
+        playlist = store.create("Мой плейлист")
+        self._edit(playlist)
+        expected = list(playlist)
+        store.close()
+
+        directory = os.path.join(self.tmp_dir.name, os.listdir(self.tmp_dir.name)[0])
+        self.assertIn("snapshot.json", os.listdir(directory))
+        restored = self._reopen(compact_every=4)
+        self.assertEqual(list(restored), expected)
+        self.assertEqual(restored.current_index(), 4)
+
+    def test_compaction_scales_with_size(self) -> None:
+        """Тест уплотнения не чаще чем раз в длину плейлиста правок."""
+        store = PlaylistStore(self.tmp_dir.name, compact_every=4)
+        playlist = store.create("Big")
+        for i in range(20):
+            playlist.append(Composition(f"Song{i}", "Artist", 10))
+        directory = os.path.join(self.tmp_dir.name, "Big")
+        store.close()
+        playlist = store.open("Big")
+        snapshot_time = os.stat(os.path.join(directory, "snapshot.json")).st_mtime_ns
+        for _ in range(19):
+            playlist.move(0, 1)
+        store.close()
+        self.assertEqual(os.stat(os.path.join(directory, "snapshot.json")).st_mtime_ns, snapshot_time)
+        self.assertEqual(len(store.open("Big")), 20)
+        store.close()
+
+    def test_names_and_delete(self) -> None:
+        """Тест перечисления и удаления плейлистов."""
+        store = PlaylistStore(self.tmp_dir.name)
+        store.create("A/B")
+        store.create("C")
+        self.assertEqual(store.names(), ["A/B", "C"])
+        store.delete("A/B")
+        self.assertEqual(store.names(), ["C"])
+        store.close()
+
+
+class TestLazyPlaylists(unittest.TestCase):
+    """Тесты для коллекции плейлистов с загрузкой по требованию."""
+
+    def setUp(self) -> None:
+        """Подготовка к тестам."""
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        playlists = LazyPlaylists(PlaylistStore(self.tmp_dir.name))
+        for name, count in (("A", 3), ("B", 4), ("C", 5)):
+            playlist = playlists.create(name)
+            for i in range(count):
+                playlist.append(Composition(f"Song{i}", name, 10))
+        playlists.close()
+
+    def tearDown(self) -> None:
+        """Освобождение ресурсов."""
+        self.tmp_dir.cleanup()
+
+    def test_catalog_without_loading(self) -> None:
+        """Тест чтения каталога без загрузки плейлистов."""
+        playlists = LazyPlaylists(PlaylistStore(self.tmp_dir.name))
+        self.assertEqual(list(playlists), ["A", "B", "C"])
+        self.assertEqual(playlists.info("B"), ("B", 4, 40))
+        self.assertFalse(playlists.is_loaded("B"))
+
+        self.assertEqual(len(playlists["B"]), 4)
+        self.assertTrue(playlists.is_loaded("B"))
+        playlists.close()
+
+    def test_lru_eviction(self) -> None:
+        """Тест выгрузки давно не использовавшихся плейлистов."""
+        evicted = []
+        playlists = LazyPlaylists(PlaylistStore(self.tmp_dir.name), max_loaded_tracks=9,
+                                  on_evict=lambda name, playlist: evicted.append(name))
+        playlists["A"].append(Composition("Extra", "A", 10))
+        for name in ("B", "C"):
+            self.assertIsNotNone(playlists[name])
+        self.assertFalse(playlists.is_loaded("A"))
+        self.assertIn("A", evicted)
+        self.assertTrue(playlists.is_loaded("C"))
+        self.assertEqual(playlists.info("A"), ("A", 4, 40))
+        self.assertEqual(len(playlists["A"]), 4)
+        playlists.close()
+
+    def test_active_not_evicted(self) -> None:
+        """Тест сохранения правок активного плейлиста при загрузке других."""
+        playlists = LazyPlaylists(PlaylistStore(self.tmp_dir.name), max_loaded_tracks=5)
+        playlists.active = "A"
+        active = playlists["A"]
+        self.assertIsNotNone(playlists["B"])
+        self.assertIsNotNone(playlists["C"])
+        self.assertTrue(playlists.is_loaded("A"))
+        self.assertFalse(playlists.is_loaded("B"))
+        active.append(Composition("Extra", "A", 10))
+        playlists.close()
+
+        playlists = LazyPlaylists(PlaylistStore(self.tmp_dir.name))
+        self.assertEqual(playlists["A"][3].title, "Extra")
+        playlists.close()
+
+    def test_relocate_unloaded(self) -> None:
+        """Тест перемещения и удаления файлов в незагруженных плейлистах."""
+        playlists = LazyPlaylists(PlaylistStore(self.tmp_dir.name))
+        playlists["A"].append(Composition("Moved", "A", 10, "/music/old.mp3"))
+        playlists["B"].append(Composition("Gone", "B", 10, "/music/gone.mp3"))
+        playlists.close()
+        segments_c = sorted(os.listdir(os.path.join(self.tmp_dir.name, "C")))
+
+        playlists = LazyPlaylists(PlaylistStore(self.tmp_dir.name))
+        self.assertEqual(len(playlists["A"]), 4)
+        moved, removed = {"/music/old.mp3": "/music/new.mp3"}, {"/music/gone.mp3"}
+        opened = playlists.store.relocate_unloaded(moved, removed)
+        self.assertEqual(opened, ["A"])
+        playlists.relocate(opened, moved, removed)
+        self.assertEqual(playlists["A"][3].file_path, "/music/new.mp3")
+        self.assertFalse(playlists.is_loaded("B"))
+        self.assertEqual(playlists.info("B"), ("B", 4, 40))
+        # Плейлист без затронутых путей не получает новых сегментов журнала
+        self.assertEqual(sorted(os.listdir(os.path.join(self.tmp_dir.name, "C"))), segments_c)
+        playlists.close()
+
+        playlists = LazyPlaylists(PlaylistStore(self.tmp_dir.name))
+        self.assertEqual(playlists["A"][3].file_path, "/music/new.mp3")
+        self.assertEqual(len(playlists["B"]), 4)
+        playlists["B"].append(Composition("Later", "B", 10))
+        playlists.close()
+        playlists = LazyPlaylists(PlaylistStore(self.tmp_dir.name))
+        self.assertEqual(len(playlists["B"]), 5)
+        playlists.close()
+
+    def test_delete(self) -> None:
+        """Тест удаления плейлиста."""
+        playlists = LazyPlaylists(PlaylistStore(self.tmp_dir.name))
+        del playlists["A"]
+        self.assertNotIn("A", playlists)
+        playlists.close()
+        self.assertEqual(list(LazyPlaylists(PlaylistStore(self.tmp_dir.name))), ["B", "C"])
+
+
+class TestPlaylistHistory(unittest.TestCase):
+    """Тесты для истории правок плейлиста."""
+
+    def setUp(self) -> None:
+        """Подготовка к тестам."""
+        self.playlist = PlayList("Test Playlist")
+        for item in ("a", "b", "c"):
+            self.playlist.append(item)
+        self.history = PlaylistHistory(self.playlist)
+
+    def test_undo_redo(self) -> None:
+        """Тест отмены и повтора правок."""
+        self.playlist.append("d")
+        self.playlist.remove_at(0)
+        self.playlist.move(0, 2)
+        self.playlist.replace(1, "e")
+        self.assertEqual(list(self.playlist), ["c", "e", "b"])
+
+        while self.history.undo():
+            pass
+        self.assertEqual(list(self.playlist), ["a", "b", "c"])
+        self.assertFalse(self.history.can_undo())
+
+        while self.history.redo():
+            pass
+        self.assertEqual(list(self.playlist), ["c", "e", "b"])
+
+    def test_new_edit_clears_redo(self) -> None:
+        """Тест сброса повтора после новой правки."""
+        self.playlist.remove("b")
+        self.history.undo()
+        self.playlist.append("e")
+        self.assertFalse(self.history.can_redo())
+        self.history.undo()
+        self.assertEqual(list(self.playlist), ["a", "b", "c"])
+
+    def test_snapshot_is_immutable(self) -> None:
+        """Тест неизменности снимка при дальнейших правках."""
+        self.playlist.append("d")
+        snapshot = self.history.snapshot()
+        for i in range(200):
+            self.playlist.insert(0, i)
+        self.playlist.remove("a")
+        self.assertEqual(list(snapshot), ["a", "b", "c", "d"])
+        self.assertEqual(list(self.history.snapshot()), list(self.playlist))
+
+    def test_bulk_edit_is_one_step(self) -> None:
+        """Тест отмены пакетной правки одним шагом."""
+        for item in range(10):
+            self.playlist.append(item)
+        self.playlist.remove_many(range(0, 13, 2))
+        self.assertTrue(self.history.undo())
+        self.assertEqual(list(self.playlist), ["a", "b", "c", *range(10)])
+        self.assertTrue(self.history.redo())
+        self.assertEqual(list(self.playlist), ["b", 0, 2, 4, 6, 8])
+        self.assertTrue(self.history.undo())
+        self.assertEqual(len(self.playlist), 13)
+
+    def test_undo_restores_current(self) -> None:
+        """Тест возврата текущего трека при отмене его удаления."""
+        self.playlist.set_current(1)
+        self.playlist.remove_at(1)
+        self.assertEqual(self.playlist.current(), "c")
+        self.history.undo()
+        self.assertEqual(self.playlist.current(), "b")
+        self.history.redo()
+        self.assertEqual(self.playlist.current(), "c")
+        self.history.undo()
+        self.assertEqual(self.playlist.current(), "b")
+
+    def test_snapshot_from_background_thread(self) -> None:
+        """Тест снимков в фоновом потоке во время переноса базы истории."""
+        errors = []
+        sizes = []
+        done = threading.Event()
+
+        def reader() -> None:
+            try:
+                while not done.is_set():
+                    sizes.append(len(self.history.snapshot()))
+            except Exception as error:  # pylint: disable=broad-except
+                errors.append(error)
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        for i in range(3000):
+            self.playlist.append(i)
+        done.set()
+        thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(sizes, sorted(sizes))
+        self.assertEqual(list(self.history.snapshot()), list(self.playlist))
+
+
+class TestConcurrency(unittest.TestCase):
+    """Нагрузочные тесты многопоточного доступа к плейлисту."""
+
+    def assert_ring_consistent(self, linked_list: LinkedList) -> None:
+        """Проверить целостность кольца в обоих направлениях."""
+        forward = []
+        node = linked_list.first_item
+        for _ in range(len(linked_list)):
+            forward.append(node.track)
+            self.assertIs(node.next_item().previous_item(), node)
+            node = node.next_item()
+        self.assertIs(node, linked_list.first_item)
+        self.assertEqual(forward, list(linked_list))
+
+    def test_readers_and_writers(self) -> None:
+        """Тест одновременной работы читателей и писателей."""
+        playlist = PlayList("Stress")
+        for i in range(100):
+            playlist.append(i)
+        playlist.set_current(0)
+        errors = []
+
+        def writer(seed: int) -> None:
+            rng = random.Random(seed)
+            for i in range(500):
+                choice = rng.random()
+                with playlist.lock:
+                    size = len(playlist)
+                    if choice < 0.4 or size < 2:
+                        playlist.append(seed * 1000 + i)
+                    elif choice < 0.7:
+                        playlist.remove_at(rng.randrange(size))
+                    elif choice < 0.9:
+                        playlist.move(rng.randrange(size), rng.randrange(size))
+                    else:
+                        playlist.next_track()
+
+        def reader() -> None:
+            for _ in range(200):
+                with playlist.lock:
+                    epoch = playlist.epoch
+                    expected = len(playlist)
+                items = playlist.snapshot()
+                if playlist.epoch == epoch and len(items) != expected:
+                    errors.append((expected, len(items)))
+                for item in playlist:
+                    if not isinstance(item, int):
+                        errors.append(item)
+
+        threads = [threading.Thread(target=writer, args=(seed,)) for seed in range(1, 9)]
+        threads += [threading.Thread(target=reader) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assert_ring_consistent(playlist)
+        self.assertIn(playlist.current(), playlist)
+
+    def test_iterators_are_independent(self) -> None:
+        """Тест независимости параллельных итераторов."""
+        linked_list = LinkedList()
+        for item in ("a", "b", "c"):
+            linked_list.append(item)
+        pairs = [(x, y) for x in linked_list for y in linked_list]
+        self.assertEqual(len(pairs), 9)
+
+    def test_dispatcher_applies_in_gui_thread(self) -> None:
+        """Тест передачи изменений из рабочих потоков пакетами."""
+        playlist = PlayList("Import")
+        dispatcher = GuiDispatcher(max_batch=150)
+        applied_in = set()
+
+        def append(item: int) -> None:
+            applied_in.add(threading.get_ident())
+            playlist.append(item)
+
+        def worker(offset: int) -> None:
+            for i in range(50):
+                dispatcher.submit(append, offset + i)
+
+        threads = [threading.Thread(target=worker, args=(n * 100,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(dispatcher.drain(), 150)
+        self.assertEqual(dispatcher.drain(), 50)
+        self.assertEqual(len(playlist), 200)
+        self.assertEqual(applied_in, {threading.get_ident()})
+
+    def test_dispatcher_reports_failures(self) -> None:
+        """Тест вывода ошибок вызовов без прерывания пакета."""
+        dispatcher = GuiDispatcher()
+        applied = []
+        dispatcher.submit(lambda: 1 / 0)
+        dispatcher.submit(applied.append, 1)
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            self.assertEqual(dispatcher.drain(), 2)
+        self.assertEqual(applied, [1])
+        self.assertEqual(dispatcher.failed, 1)
+        self.assertIn("ZeroDivisionError", stderr.getvalue())
+
+    def test_dispatcher_wakeup(self) -> None:
+        """Тест одного запроса выполнения на пачку вызовов."""
+        wakeups = []
+        dispatcher = GuiDispatcher(max_batch=2, wakeup=lambda: wakeups.append(1))
+        for i in range(3):
+            dispatcher.submit(print, i)
+        self.assertEqual(len(wakeups), 1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(dispatcher.drain(), 2)
+            self.assertEqual(len(wakeups), 2)
+            self.assertEqual(dispatcher.drain(), 1)
+        self.assertEqual(len(wakeups), 2)
+
+
+def write_wav(path: str, samples, channels: int = 1, sample_width: int = 2) -> None:
+    """Записать целочисленные отсчёты в WAV-файл."""
+    formats = {1: "B", 2: "h", 4: "i"}
+    with wave.open(path, "wb") as wav_file:
+        # pylint: disable=no-member
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(8000)
+        wav_file.writeframes(struct.pack(f"<{len(samples)}{formats[sample_width]}", *samples))
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "NumPy не установлен")
+class TestWaveform(unittest.TestCase):
+    """Тесты для построения и кэширования формы волны."""
+
+    def setUp(self) -> None:
+        """Подготовка к тестам."""
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.wav_path = os.path.join(self.tmp_dir.name, "track.wav")
+        # Первая половина тихая, вторая — полная амплитуда
+        write_wav(self.wav_path, [0] * 400 + [32767, -32768] * 200)
+
+    def tearDown(self) -> None:
+        """Освобождение ресурсов."""
+        self.tmp_dir.cleanup()
+
+    def test_wav_peaks(self) -> None:
+        """Тест вычисления пиков по столбцам."""
+        peaks = wav_peaks(self.wav_path, 4)
+        self.assertEqual(peaks.shape, (4, 2))
+        self.assertEqual(peaks[:2].tolist(), [[0, 0], [0, 0]])
+        self.assertEqual(peaks[2:].tolist(), [[-127, 127], [-127, 127]])
+
+    def test_stereo_and_8bit(self) -> None:
+        """Тест многоканальных и 8-битных файлов."""
+        stereo_path = os.path.join(self.tmp_dir.name, "stereo.wav")
+        write_wav(stereo_path, [0, 16384] * 10 + [-16384, 0] * 10, channels=2)
+        self.assertEqual(wav_peaks(stereo_path, 2).tolist(), [[0, 64], [-64, 0]])
+
+        byte_path = os.path.join(self.tmp_dir.name, "8bit.wav")
+        write_wav(byte_path, [128] * 10 + [255, 0] * 5, sample_width=1)
+        self.assertEqual(wav_peaks(byte_path, 2).tolist(), [[0, 0], [-127, 126]])
+
+    def test_cache(self) -> None:
+        """Тест сохранения пиков в кэше и фонового построения."""
+        cache = WaveformCache(os.path.join(self.tmp_dir.name, "cache"), width=8)
+        self.assertIsNone(cache.get(self.wav_path))
+        done = threading.Event()
+        results = []
+
+        def on_ready(path: str, peaks) -> None:
+            results.append((path, peaks.shape))
+            done.set()
+
+        cache.request(self.wav_path, on_ready)
+        self.assertTrue(done.wait(10))
+        cache.close()
+        self.assertEqual(results, [(self.wav_path, (8, 2))])
+        self.assertEqual(cache.get(self.wav_path).shape, (8, 2))
+        self.assertEqual(cache.build_batch([self.wav_path]), [])
+        self.assertIsNone(cache.compute(os.path.join(self.tmp_dir.name, "missing.wav")))
+
+
+def sine(amplitude: float, seconds: float = 2.0, rate: int = 8000):
+    """Отсчёты синусоиды 440 Гц для 16-битного WAV."""
+    return [int(amplitude * 32767 * math.sin(2 * math.pi * 440 * i / rate)) for i in range(int(seconds * rate))]
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "NumPy не установлен")
+class TestLoudness(unittest.TestCase):
+    """Тесты для анализа громкости."""
+
+    def setUp(self) -> None:
+        """Подготовка к тестам."""
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.loud_path = os.path.join(self.tmp_dir.name, "loud.wav")
+        self.quiet_path = os.path.join(self.tmp_dir.name, "quiet.wav")
+        write_wav(self.loud_path, sine(0.9))
+        write_wav(self.quiet_path, sine(0.05))
+
+    def tearDown(self) -> None:
+        """Освобождение ресурсов."""
+        self.tmp_dir.cleanup()
+
+    def test_analyze_file(self) -> None:
+        """Тест измерения громкости и пика."""
+        loud = analyze_file(self.loud_path)
+        quiet = analyze_file(self.quiet_path)
+        # Среднеквадратичный уровень синусоиды на 3 дБ ниже амплитуды
+        self.assertAlmostEqual(loud.loudness, -0.691 + 20 * math.log10(0.9) - 3.01, delta=0.1)
+        self.assertAlmostEqual(loud.peak, 0.9, delta=0.01)
+        self.assertAlmostEqual(quiet.loudness - loud.loudness, 20 * math.log10(0.05 / 0.9), delta=0.1)
+        self.assertLess(loud.gain_db, 0)
+        self.assertAlmostEqual(quiet.gain_db, -18.0 - quiet.loudness, places=6)
+
+    def test_gain_limited_by_peak(self) -> None:
+        """Тест ограничения усиления пиковым уровнем."""
+        spike_path = os.path.join(self.tmp_dir.name, "spike.wav")
+        samples = sine(0.02)
+        samples[100] = 32767
+        write_wav(spike_path, samples)
+        self.assertAlmostEqual(analyze_file(spike_path).gain_db, 0.0, places=3)
+
+    def test_silence(self) -> None:
+        """Тест анализа тишины."""
+        silent_path = os.path.join(self.tmp_dir.name, "silent.wav")
+        write_wav(silent_path, [0] * 8000)
+        self.assertEqual(analyze_file(silent_path).gain_db, 0.0)
+
+    def test_volume_for(self) -> None:
+        """Тест перевода усиления в громкость микшера."""
+        self.assertEqual(volume_for(6.0), 1.0)
+        self.assertAlmostEqual(volume_for(-6.0), 0.501, places=3)
+
+    def test_analyzer_cache(self) -> None:
+        """Тест пакетного анализа в пуле процессов и кэша."""
+        analyzer = LoudnessAnalyzer(os.path.join(self.tmp_dir.name, "metadata.db"), workers=2, max_pending=1)
+        self.assertEqual(analyzer.analyze_batch([self.loud_path, self.quiet_path]), 2)
+        # Результат сохраняется в обработчике завершения — дожидаемся его
+        for _ in range(1200):
+            if analyzer.pending() == 0:
+                break
+            threading.Event().wait(0.05)
+        self.assertIsNotNone(analyzer.get(self.quiet_path))
+        self.assertAlmostEqual(analyzer.get(self.loud_path).peak, 0.9, delta=0.01)
+        self.assertIsNone(analyzer.request(self.loud_path))
+        analyzer.forget(self.loud_path)
+        self.assertIsNone(analyzer.get(self.loud_path))
+        analyzer.close()
+
+
+class TestLibraryWatcher(unittest.TestCase):
+    """Тесты для наблюдателя за папками библиотеки."""
+
+    def setUp(self) -> None:
+        """Подготовка к тестам."""
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.library = os.path.join(self.tmp_dir.name, "library")
+        self.state_path = os.path.join(self.tmp_dir.name, "library.json")
+        os.makedirs(os.path.join(self.library, "album"))
+        self.song_path = self._write("album/song.mp3", b"song")
+        self._write("album/cover.jpg", b"cover")
+
+    def tearDown(self) -> None:
+        """Освобождение ресурсов."""
+        self.tmp_dir.cleanup()
+
+    def _write(self, relative_path: str, data: bytes) -> str:
+        """Создать файл в библиотеке."""
+        path = os.path.join(self.library, relative_path)
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def _watcher(self, callback=None) -> LibraryWatcher:
+        """Создать наблюдатель с опросом."""
+        watcher = LibraryWatcher(callback or (lambda changes: None), self.state_path, use_inotify=False)
+        watcher.add_root(self.library)
+        return watcher
+
+    def test_polling_changes(self) -> None:
+        """Тест обнаружения добавления, удаления и перемещения при опросе."""
+        watcher = self._watcher()
+        self.assertEqual(watcher.scan(), LibraryChanges([self.song_path], [], [], []))
+        self.assertTrue(watcher.scan().is_empty())
+
+        os.makedirs(os.path.join(self.library, "other"))
+        moved_path = os.path.join(self.library, "other", "renamed.mp3")
+        os.rename(self.song_path, moved_path)
+        new_path = self._write("album/new.ogg", b"new track")
+        self.assertEqual(watcher.scan(), LibraryChanges([new_path], [], [], [(self.song_path, moved_path)]))
+
+        os.remove(new_path)
+        self.assertEqual(watcher.scan(), LibraryChanges([], [new_path], [], []))
+
+    def test_add_root_during_scan(self) -> None:
+        """Тест добавления папки, пока идёт проход по дереву."""
+        watcher = self._watcher()
+        other = os.path.join(self.tmp_dir.name, "other")
+        # Проход по дереву держит блокировку состояния; add_root её не ждёт
+        with watcher._lock:  # pylint: disable=protected-access
+            watcher.add_root(other)
+        self.assertEqual(watcher.roots, [self.library, other])
+
+    def test_state_persisted(self) -> None:
+        """Тест обнаружения изменений, сделанных между запусками."""
+        watcher = self._watcher()
+        watcher.scan()
+        watcher.close()
+
+        os.remove(self.song_path)
+        watcher = LibraryWatcher(lambda changes: None, self.state_path, use_inotify=False)
+        self.assertEqual(watcher.roots, [self.library])
+        self.assertEqual(watcher.scan().removed, [self.song_path])
+
+    def test_missing_root_is_not_removed(self) -> None:
+        """Тест: недоступная папка не считается удалённой."""
+        watcher = self._watcher()
+        watcher.scan()
+        os.rename(self.library, self.library + ".offline")
+        self.assertTrue(watcher.scan().is_empty())
+        os.rename(self.library + ".offline", self.library)
+        self.assertTrue(watcher.scan().is_empty())
+
+    @unittest.skipUnless(os.path.exists("/proc/sys/fs/inotify"), "inotify недоступен")
+    def test_inotify(self) -> None:
+        """Тест отслеживания изменений через inotify."""
+        received = []
+        event = threading.Event()
+
+        def on_changes(changes: LibraryChanges) -> None:
+            received.append(changes)
+            event.set()
+
+        watcher = LibraryWatcher(on_changes, self.state_path, use_inotify=True)
+        watcher.add_root(self.library)
+        watcher.start()
+        self.assertTrue(event.wait(5))
+        event.clear()
+        new_path = self._write("album/new.wav", b"new")
+        self.assertTrue(event.wait(5))
+        watcher.close()
+        self.assertEqual(received[-1].added, [new_path])
+
+    def test_apply_to_playlist(self) -> None:
+        """Тест применения изменений к плейлисту."""
+        playlist = PlayList("Library")
+        playlist.append(Composition("Song", "Artist", 100, "/music/a.mp3"))
+        playlist.append(Composition("Gone", "Artist", 100, "/music/b.mp3"))
+        playlist.append(Composition("Kept", "Artist", 100, "/music/c.mp3"))
+        changes = LibraryChanges([], ["/music/b.mp3"], [], [("/music/a.mp3", "/music/new/a.mp3")])
+
+        self.assertEqual(apply_to_playlist(playlist, changes), 2)
+        self.assertEqual([track.file_path for track in playlist], ["/music/new/a.mp3", "/music/c.mp3"])
+        self.assertEqual(playlist[0].title, "Song")
+
+
+class TestControlServer(unittest.TestCase):  # pylint: disable=too-many-instance-attributes
+    """Тесты для сервера управления."""
+
+    def setUp(self) -> None:
+        """Подготовка к тестам."""
+        self.tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.playlist = PlayList("Remote")
+        self.dispatcher = GuiDispatcher()
+        self.gui_thread = threading.current_thread()
+        self.calls = []
+        self.stop = threading.Event()
+        self.pump = threading.Thread(target=self._pump)
+        self.pump.start()
+
+        def remember() -> int:
+            self.calls.append(threading.current_thread())
+            return len(self.calls)
+
+        self.handlers = {
+            "count": lambda: len(self.playlist),
+            "remember": remember,
+            "add_tracks": lambda tracks: add_tracks(self.playlist, tracks),
+            "remove_tracks": lambda indexes: remove_tracks(self.playlist, indexes),
+            "move_tracks": lambda moves: move_tracks(self.playlist, moves),
+        }
+
+    def tearDown(self) -> None:
+        """Освобождение ресурсов."""
+        self.stop.set()
+        self.pump.join()
+        self.tmp_dir.cleanup()
+
+    def _pump(self) -> None:
+        """Имитация таймера потока интерфейса."""
+        self.gui_thread = threading.current_thread()
+        while not self.stop.is_set():
+            self.dispatcher.drain()
+            self.stop.wait(0.001)
+
+    def _start(self, unix: bool) -> ControlServer:
+        """Запустить сервер на Unix-сокете или TCP."""
+        unix_path = os.path.join(self.tmp_dir.name, "control.sock") if unix else None
+        server = ControlServer(self.dispatcher, self.handlers, unix_path=unix_path)
+        server.start()
+        self.addCleanup(server.close)
+        return server
+
+    def test_bulk_commands(self) -> None:
+        """Тест пакетных правок плейлиста по TCP."""
+        client = ControlClient(self._start(unix=False).address)
+        self.addCleanup(client.close)
+        tracks = [{"title": f"Song {i}", "artist": "Artist", "duration": 100} for i in range(10)]
+
+        self.assertEqual(client.call("add_tracks", tracks=tracks), 10)
+        self.assertEqual(client.call("remove_tracks", indexes=[9, 0, 4]), 3)
+        self.assertEqual(client.call("move_tracks", moves=[[0, 6]]), 1)
+        self.assertEqual(
+            [track.title for track in self.playlist],
+            ["Song 2", "Song 3", "Song 5", "Song 6", "Song 7", "Song 8", "Song 1"]
+        )
+
+    def test_pipelined_order_and_errors(self) -> None:
+        """Тест порядка ответов и ошибок при отправке без ожидания."""
+        client = ControlClient(self._start(unix=True).address)
+        self.addCleanup(client.close)
+
+        responses = client.call_many(
+            [{"cmd": "remember"} for _ in range(500)]
+            + [{"cmd": "unknown"}, {"cmd": "count", "extra": 1}, {"cmd": "remove_tracks", "indexes": [3]}]
+        )
+        self.assertEqual([response["result"] for response in responses[:500]], list(range(1, 501)))
+        self.assertEqual([response["id"] for response in responses], list(range(1, 504)))
+        self.assertTrue(all(not response["ok"] for response in responses[500:]))
+        self.assertEqual(set(self.calls), {self.gui_thread})
+        with self.assertRaises(RuntimeError):
+            client.call("unknown")
+
+    def test_socket_in_use(self) -> None:
+        """Тест отказа второго экземпляра и замены устаревшего сокета."""
+        server = self._start(unix=True)
+        second = ControlServer(self.dispatcher, self.handlers, unix_path=server.address)
+        with self.assertRaises(OSError):
+            second.start()
+        second.close()
+        client = ControlClient(server.address)
+        self.assertEqual(client.call("count"), 0)
+        client.close()
+        server.close()
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(server.address)
+        client = ControlClient(self._start(unix=True).address)
+        self.assertEqual(client.call("count"), 0)
+        client.close()
+
+    def test_prepare_outside_gui_thread(self) -> None:
+        """Тест подготовки треков в потоке сервера и прав на сокет."""
+        server = self._start(unix=True)
+        self.assertEqual(stat.S_IMODE(os.stat(server.address).st_mode), 0o600)
+        client = ControlClient(server.address)
+        self.addCleanup(client.close)
+        prepared = []
+
+        def prepare(arguments: dict) -> dict:
+            prepared.append(threading.current_thread())
+            return prepare_tracks(arguments)
+
+        server.preparers["add_tracks"] = prepare
+        self.assertEqual(client.call("add_tracks", tracks=[{"title": "Song", "artist": "Artist", "duration": 10}]), 1)
+        self.assertIsInstance(self.playlist[0], Composition)
+        self.assertNotIn(self.gui_thread, prepared)
+        with self.assertRaises(RuntimeError):
+            client.call("add_tracks", tracks=[{"artist": "Artist"}])
+        self.assertEqual(len(self.playlist), 1)
+
+    def test_bad_request(self) -> None:
+        """Тест ответа на строки, не являющиеся JSON-объектом."""
+        server = self._start(unix=False)
+        with socket.create_connection(server.address) as connection:
+            connection.sendall(b'not json\n[1]\n{"id": 7, "cmd": "count"}\n')
+            lines = connection.makefile("rb")
+            responses = [json.loads(lines.readline()) for _ in range(3)]
+        self.assertEqual([response["ok"] for response in responses], [False, False, True])
+        self.assertEqual(responses[2], {"id": 7, "ok": True, "result": 0})
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,297 @@
+"""Модуль для построения и кэширования обзора формы волны композиций."""
+import hashlib
+import multiprocessing
+import os
+import struct
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+DEFAULT_WAVEFORMS_PATH = os.path.join(os.path.expanduser("~"), ".music_player", "waveforms")
+
+# Количество кадров, обрабатываемых за один векторный шаг
+_BLOCK_FRAMES = 1 << 20
+
+
+# Функция (начало, конец) -> массив float32 формы (кадры, каналы) в диапазоне -1..1
+BlockReader = Callable[[int, int], Any]
+
+
+def _read_wav_layout(path: str) -> Tuple[int, int, int, int, int, int]:
+    """Найти формат и положение блока данных в WAV-файле.
+
+    Returns:
+        (формат, каналы, частота, бит на отсчёт, смещение данных, длина данных в байтах)
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        header = file.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            raise ValueError("Not a WAV file")
+        fmt = None
+        while True:
+            chunk = file.read(8)
+            if len(chunk) < 8:
+                raise ValueError("WAV data chunk not found")
+            chunk_id, size = struct.unpack("<4sI", chunk)
+            if chunk_id == b"fmt ":
+                data = file.read(size)
+                tag, channels, rate, _, _, bits = struct.unpack("<HHIIHH", data[:16])
+                if tag == 0xFFFE and size >= 26:
+                    # WAVE_FORMAT_EXTENSIBLE: реальный формат в начале GUID
+                    tag = struct.unpack("<H", data[24:26])[0]
+                fmt = (tag, channels, rate, bits)
+                file.seek(size & 1, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError("WAV fmt chunk not found")
+                offset = file.tell()
+                return fmt + (offset, min(size, file_size - offset))
+            else:
+                file.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def _reduce_peaks(read_block: BlockReader, frames: int, width: int) -> Any:
+    """Свести кадры к минимуму и максимуму на каждый столбец.
+
+    Args:
+        read_block: Функция чтения блока кадров
+        frames: Общее количество кадров
+        width: Количество столбцов
+
+    Returns:
+        Массив int8 формы (width, 2) с минимумом и максимумом в диапазоне -127..127
+    """
+    peaks = np.zeros((width, 2), dtype=np.float32)
+    if frames <= 0:
+        return peaks.astype(np.int8)
+    frames_per_column = -(-frames // width)
+    columns = -(-frames // frames_per_column)
+    columns_per_block = max(1, _BLOCK_FRAMES // frames_per_column)
+    for first_column in range(0, columns, columns_per_block):
+        last_column = min(columns, first_column + columns_per_block)
+        block = read_block(first_column * frames_per_column, min(frames, last_column * frames_per_column))
+        starts = np.arange(0, block.shape[0], frames_per_column)
+        peaks[first_column:last_column, 0] = np.minimum.reduceat(block.min(axis=1), starts)
+        peaks[first_column:last_column, 1] = np.maximum.reduceat(block.max(axis=1), starts)
+    return np.clip(np.round(peaks * 127), -127, 127).astype(np.int8)
+
+
+def open_wav(path: str) -> Tuple[BlockReader, int, int, int]:
+    """Отобразить блок данных WAV-файла в память.
+
+    Returns:
+        (функция чтения блока, количество кадров, каналы, частота)
+    """
+    tag, channels, rate, bits, offset, length = _read_wav_layout(path)
+    sample_bytes = bits // 8
+    if channels <= 0 or sample_bytes <= 0:
+        raise ValueError("Unsupported WAV format")
+    frames = length // (channels * sample_bytes)
+    if frames == 0:
+        return (lambda start, end: np.zeros((0, channels), dtype=np.float32)), 0, channels, rate
+
+    if bits == 24:
+        raw = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(frames * channels * 3,))
+
+        def read_block(start: int, end: int) -> Any:
+            data = raw[start * channels * 3:end * channels * 3].reshape(-1, 3).astype(np.int32)
+            values = data[:, 0] | (data[:, 1] << 8) | (data[:, 2] << 16)
+            values = np.where(values & 0x800000, values - 0x1000000, values)
+            return (values.astype(np.float32) / 8388608.0).reshape(-1, channels)
+    else:
+        if tag == 3 and bits in (32, 64):
+            dtype, bias, scale = ("<f4" if bits == 32 else "<f8"), 0.0, 1.0
+        elif tag == 1 and bits == 8:
+            dtype, bias, scale = np.uint8, 128.0, 128.0
+        elif tag == 1 and bits in (16, 32):
+            dtype, bias, scale = ("<i2" if bits == 16 else "<i4"), 0.0, float(2 ** (bits - 1))
+        else:
+            raise ValueError("Unsupported WAV format")
+        samples = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(frames * channels,))
+
+        def read_block(start: int, end: int) -> Any:
+            data = samples[start * channels:end * channels].astype(np.float32)
+            return ((data - bias) / scale).reshape(-1, channels)
+
+    return read_block, frames, channels, rate
+
+
+_decoder_ready = False  # pylint: disable=invalid-name
+
+
+def decode_audio(path: str) -> Tuple[BlockReader, int, int, int]:
+    """Декодировать сжатый файл целиком через pygame.
+
+    Предназначено для рабочих процессов, чтобы декодирование не мешало воспроизведению.
+    pygame не умеет декодировать потоково, поэтому весь трек держится в памяти:
+    около 10 МБ на минуту стереозвука 44.1 кГц.
+
+    Returns:
+        (функция чтения блока, количество кадров, каналы, частота)
+    """
+    global _decoder_ready  # pylint: disable=global-statement
+    import pygame  # pylint: disable=import-outside-toplevel
+    if not _decoder_ready:
+        # Рабочему процессу вывод звука не нужен
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        pygame.mixer.init()
+        _decoder_ready = True
+    rate, size, _ = pygame.mixer.get_init()
+    samples = pygame.sndarray.array(pygame.mixer.Sound(path))
+    if samples.ndim == 1:
+        samples = samples.reshape(-1, 1)
+    scale = float(2 ** (abs(size) - 1)) if size not in (32, -32) else 1.0
+
+    def read_block(start: int, end: int) -> Any:
+        return samples[start:end].astype(np.float32) / scale
+
+    return read_block, samples.shape[0], samples.shape[1], rate
+
+
+def open_audio(path: str) -> Tuple[BlockReader, int, int, int]:
+    """Открыть аудиофайл для поблочного чтения: WAV через memmap, остальные — декодированием."""
+    if path.lower().endswith(".wav"):
+        return open_wav(path)
+    return decode_audio(path)
+
+
+def wav_peaks(path: str, width: int) -> Any:
+    """Построить пики WAV-файла через отображение блока данных в память."""
+    read_block, frames, _, _ = open_wav(path)
+    return _reduce_peaks(read_block, frames, width)
+
+
+def decoded_peaks(path: str, width: int) -> Any:
+    """Декодировать сжатый файл и построить пики."""
+    read_block, frames, _, _ = decode_audio(path)
+    return _reduce_peaks(read_block, frames, width)
+
+
+class WaveformCache:
+    """Кэш пиков формы волны на диске.
+
+    Ключ записи — путь, размер и время изменения файла, поэтому изменённый
+    файл получает новую запись. WAV-файлы обрабатываются через numpy.memmap
+    в потоке, сжатые форматы декодируются один раз в пуле процессов.
+    Без NumPy кэш ничего не строит и всегда возвращает None.
+    """
+
+    def __init__(self, directory: str = DEFAULT_WAVEFORMS_PATH, width: int = 1000,
+                 workers: int = 2) -> None:
+        """Инициализация кэша.
+
+        Args:
+            directory: Каталог с файлами пиков
+            width: Количество столбцов в обзоре
+            workers: Количество потоков и процессов для построения
+        """
+        self.directory = directory
+        self.width = width
+        self.workers = workers
+        self._lock = threading.RLock()
+        self._pending: Dict[str, Future] = {}
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _cache_path(self, path: str) -> Optional[str]:
+        """Путь к файлу пиков для аудиофайла или None, если файла нет."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        identity = f"{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0{self.width}"
+        return os.path.join(self.directory, hashlib.sha1(identity.encode("utf-8")).hexdigest() + ".npy")
+
+    def get(self, path: str) -> Optional[Any]:
+        """Получить пики из кэша без построения."""
+        if not NUMPY_AVAILABLE:
+            return None
+        cache_path = self._cache_path(path)
+        if cache_path is None or not os.path.exists(cache_path):
+            return None
+        try:
+            return np.load(cache_path)
+        except (OSError, ValueError):
+            return None
+
+    def compute(self, path: str) -> Optional[Any]:
+        """Получить пики, построив и сохранив их при отсутствии в кэше."""
+        peaks = self.get(path)
+        if peaks is not None or not NUMPY_AVAILABLE:
+            return peaks
+        cache_path = self._cache_path(path)
+        if cache_path is None:
+            return None
+        try:
+            if path.lower().endswith(".wav"):
+                peaks = wav_peaks(path, self.width)
+            else:
+                peaks = self._process_pool().submit(decoded_peaks, path, self.width).result()
+        except Exception:  # pylint: disable=broad-except
+            # Повреждённый или неподдерживаемый файл
+            return None
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            np.save(file, peaks)
+        os.replace(tmp_path, cache_path)
+        return peaks
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        """Пул процессов для декодирования сжатых форматов."""
+        with self._lock:
+            if self._processes is None:
+                # spawn, а не fork: процесс интерфейса многопоточный и уже инициализировал микшер
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._processes
+
+    def request(self, path: str, callback: Optional[Callable[[str, Any], None]] = None) -> Optional[Future]:
+        """Построить пики в фоне.
+
+        Args:
+            path: Путь к аудиофайлу
+            callback: Вызывается в рабочем потоке как callback(путь, пики)
+        """
+        if not NUMPY_AVAILABLE:
+            return None
+        with self._lock:
+            future = self._pending.get(path)
+            if future is None:
+                if self._threads is None:
+                    self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="waveform")
+                future = self._threads.submit(self.compute, path)
+                self._pending[path] = future
+                future.add_done_callback(lambda _: self._forget(path))
+        if callback is not None:
+            future.add_done_callback(lambda done: callback(path, done.result()))
+        return future
+
+    def _forget(self, path: str) -> None:
+        """Убрать завершённое построение из списка ожидающих."""
+        with self._lock:
+            self._pending.pop(path, None)
+
+    def build_batch(self, paths: Iterable[str]) -> List[Future]:
+        """Построить пики для набора файлов в фоне, например для всего плейлиста."""
+        futures = []
+        for path in paths:
+            if path and self.get(path) is None:
+                future = self.request(path)
+                if future is not None:
+                    futures.append(future)
+        return futures
+
+    def close(self) -> None:
+        """Остановить фоновые построения."""
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)